@@ -6,7 +6,7 @@ import discord
 from discord.ext import commands
 
 import __init__  # noqa
-import database
+from chiya import database
 from config import config
 
 
@@ -45,5 +45,5 @@ async def on_ready() -> None:
 if __name__ == "__main__":
     for cog in glob.iglob(os.path.join("cogs", "**", "[!^_]*.py"), root_dir="chiya", recursive=True):
         bot.load_extension(cog.replace("/", ".").replace("\\", ".").replace(".py", ""))
-    database.Database().setup()
+    database.setup()
     bot.run(config["bot"]["token"])
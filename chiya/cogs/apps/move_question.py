@@ -8,6 +8,7 @@ from discord.ext import commands
 
 from chiya import config
 from chiya.utils import embeds
+from chiya.utils.helpers import is_staff
 
 
 log = logging.getLogger(__name__)
@@ -25,8 +26,7 @@ class MoveQuestionApp(commands.Cog):
         """
         await ctx.defer(ephemeral=True)
 
-        staff = [x for x in ctx.author.roles if x.id == config["roles"]["staff"] or x.id == config["roles"]["trial"]]
-        if not staff:
+        if not is_staff(ctx.author):
             return await embeds.error_message(ctx=ctx, description="You do not have permissions to use this command.")
 
         if ctx.channel.category_id in [
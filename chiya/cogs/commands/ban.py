@@ -102,18 +102,16 @@ class BansCommands(commands.Cog):
                 ),
             )
 
-        db = database.Database().get()
-        db["mod_logs"].insert(
-            dict(
-                user_id=user.id,
-                mod_id=ctx.author.id,
-                timestamp=int(time.time()),
-                reason=reason,
-                type="ban",
+        async with database.session() as db:
+            await db["mod_logs"].insert(
+                dict(
+                    user_id=user.id,
+                    mod_id=ctx.author.id,
+                    timestamp=int(time.time()),
+                    reason=reason,
+                    type="ban",
+                )
             )
-        )
-        db.commit()
-        db.close()
 
         await ctx.guild.ban(user=user, reason=reason, delete_message_days=daystodelete or 0)
         await ctx.send_followup(embed=embed)
@@ -153,12 +151,10 @@ class BansCommands(commands.Cog):
             color=discord.Color.green(),
         )
 
-        db = database.Database().get()
-        db["mod_logs"].insert(
-            dict(user_id=user.id, mod_id=ctx.author.id, timestamp=int(time.time()), reason=reason, type="unban")
-        )
-        db.commit()
-        db.close()
+        async with database.session() as db:
+            await db["mod_logs"].insert(
+                dict(user_id=user.id, mod_id=ctx.author.id, timestamp=int(time.time()), reason=reason, type="unban")
+            )
 
         await ctx.guild.unban(user=user, reason=reason)
         await ctx.send_followup(embed=embed)
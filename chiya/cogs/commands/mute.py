@@ -99,19 +99,17 @@ class MuteCommands(commands.Cog):
                 ),
             )
 
-        db = database.Database().get()
-        db["mod_logs"].insert(
-            dict(
-                user_id=member.id,
-                mod_id=ctx.author.id,
-                timestamp=int(time.time()),
-                reason=reason,
-                duration=duration_string,
-                type="mute",
+        async with database.session() as db:
+            await db["mod_logs"].insert(
+                dict(
+                    user_id=member.id,
+                    mod_id=ctx.author.id,
+                    timestamp=int(time.time()),
+                    reason=reason,
+                    duration=duration_string,
+                    type="mute",
+                )
             )
-        )
-        db.commit()
-        db.close()
 
         await member.timeout(until=datetime.utcfromtimestamp(mute_end_time), reason=reason)
         await ctx.send_followup(embed=mute_embed)
@@ -178,18 +176,16 @@ class MuteCommands(commands.Cog):
                 ),
             )
 
-        db = database.Database().get()
-        db["mod_logs"].insert(
-            dict(
-                user_id=member.id,
-                mod_id=ctx.author.id,
-                timestamp=int(time.time()),
-                reason=reason,
-                type="unmute",
+        async with database.session() as db:
+            await db["mod_logs"].insert(
+                dict(
+                    user_id=member.id,
+                    mod_id=ctx.author.id,
+                    timestamp=int(time.time()),
+                    reason=reason,
+                    type="unmute",
+                )
             )
-        )
-        db.commit()
-        db.close()
 
         await member.remove_timeout(reason=reason)
         await ctx.send_followup(embed=unmute_embed)
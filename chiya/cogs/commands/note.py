@@ -38,18 +38,16 @@ class NoteCommands(commands.Cog):
         if not isinstance(user, discord.Member):
             user = await self.bot.fetch_user(user)
 
-        db = database.Database().get()
-        note_id = db["mod_logs"].insert(
-            dict(
-                user_id=user.id,
-                mod_id=ctx.author.id,
-                timestamp=int(time.time()),
-                reason=note,
-                type="note",
+        async with database.session() as db:
+            note_id = await db["mod_logs"].insert(
+                dict(
+                    user_id=user.id,
+                    mod_id=ctx.author.id,
+                    timestamp=int(time.time()),
+                    reason=note,
+                    type="note",
+                )
             )
-        )
-        db.commit()
-        db.close()
 
         embed = embeds.make_embed(
             title=f"Noting user: {user.name}",
@@ -91,13 +89,12 @@ class NoteCommands(commands.Cog):
         if not isinstance(user, discord.Member):
             user = await self.bot.fetch_user(user.id)
 
-        db = database.Database().get()
-        # TODO: can't this be merged into one call because action will return None either way?
-        if action:
-            results = db["mod_logs"].find(user_id=user.id, type=action, order_by="-id")
-        else:
-            results = db["mod_logs"].find(user_id=user.id, order_by="-id")
-        db.close()
+        async with database.session() as db:
+            # TODO: can't this be merged into one call because action will return None either way?
+            if action:
+                results = await db["mod_logs"].find(user_id=user.id, type=action, order_by="-id")
+            else:
+                results = await db["mod_logs"].find(user_id=user.id, order_by="-id")
 
         actions = []
         for action in results:
@@ -162,27 +159,25 @@ class NoteCommands(commands.Cog):
         # TODO: Add some sort of support for history or editing mods.
         await ctx.defer()
 
-        db = database.Database().get()
-        mod_log = db["mod_logs"].find_one(id=id)
-        if not mod_log:
-            return await embeds.error_message(ctx=ctx, description="Could not find a log with that ID!")
-
-        user = await self.bot.fetch_user(mod_log["user_id"])
-        embed = embeds.make_embed(
-            title=f"Edited log: {user.name}",
-            description=f"Log #{id} for {user.mention} was updated by {ctx.author.mention}",
-            thumbnail_url="https://i.imgur.com/A4c19BJ.png",
-            color=discord.Color.green(),
-            fields=[
-                {"name": "Before:", "value": mod_log["reason"], "inline": False},
-                {"name": "After:", "value": note, "inline": False},
-            ],
-        )
+        async with database.session() as db:
+            mod_log = await db["mod_logs"].find_one(id=id)
+            if not mod_log:
+                return await embeds.error_message(ctx=ctx, description="Could not find a log with that ID!")
+
+            user = await self.bot.fetch_user(mod_log["user_id"])
+            embed = embeds.make_embed(
+                title=f"Edited log: {user.name}",
+                description=f"Log #{id} for {user.mention} was updated by {ctx.author.mention}",
+                thumbnail_url="https://i.imgur.com/A4c19BJ.png",
+                color=discord.Color.green(),
+                fields=[
+                    {"name": "Before:", "value": mod_log["reason"], "inline": False},
+                    {"name": "After:", "value": note, "inline": False},
+                ],
+            )
 
-        mod_log["reason"] = note
-        db["mod_logs"].update(mod_log, ["id"])
-        db.commit()
-        db.close()
+            mod_log["reason"] = note
+            await db["mod_logs"].update(mod_log, ["id"])
 
         await ctx.send_followup(embed=embed)
 
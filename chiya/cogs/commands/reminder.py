@@ -50,19 +50,18 @@ class ReminderCommands(commands.Cog):
                 ),
             )
 
-        db = database.Database().get()
-        remind_id = db["remind_me"].insert(
-            dict(
-                reminder_location=ctx.channel.id,
-                author_id=ctx.author.id,
-                date_to_remind=end_time,
-                message=message,
-                sent=False,
-            )
+        reminder = dict(
+            reminder_location=ctx.channel.id,
+            author_id=ctx.author.id,
+            date_to_remind=end_time,
+            message=message,
+            sent=False,
         )
+        async with database.session() as db:
+            remind_id = await db["remind_me"].insert(reminder)
 
-        db.commit()
-        db.close()
+        reminder["id"] = remind_id
+        self.bot.dispatch("reminder_create", reminder)
 
         embed = embeds.make_embed(
             ctx=ctx,
@@ -91,23 +90,21 @@ class ReminderCommands(commands.Cog):
         """
         await ctx.defer()
 
-        db = database.Database().get()
-
-        remind_me = db["remind_me"]
-        result = remind_me.find_one(id=reminder_id)
-        old_message = result["message"]
+        async with database.session() as db:
+            remind_me = db["remind_me"]
+            result = await remind_me.find_one(id=reminder_id)
+            old_message = result["message"]
 
-        if result["author_id"] != ctx.author.id:
-            return await embeds.error_message(ctx, "That reminder isn't yours, so you can't edit it.")
+            if result["author_id"] != ctx.author.id:
+                return await embeds.error_message(ctx, "That reminder isn't yours, so you can't edit it.")
 
-        if result["sent"]:
-            return await embeds.error_message(ctx, "That reminder doesn't exist.")
+            if result["sent"]:
+                return await embeds.error_message(ctx, "That reminder doesn't exist.")
 
-        data = dict(id=result["id"], message=new_message)
-        remind_me.update(data, ["id"])
+            data = dict(id=result["id"], message=new_message)
+            await remind_me.update(data, ["id"])
 
-        db.commit()
-        db.close()
+        self.bot.dispatch("reminder_edit", {**result, "message": new_message})
 
         embed = embeds.make_embed(
             ctx=ctx,
@@ -130,8 +127,9 @@ class ReminderCommands(commands.Cog):
         """List your reminders."""
         await ctx.defer()
 
-        db = database.Database().get()
-        results = db["remind_me"].find(sent=False, author_id=ctx.author.id)
+        async with database.session() as db:
+            results = await db["remind_me"].find(sent=False, author_id=ctx.author.id)
+
         reminders = []
         for result in results:
             reminders.append(
@@ -159,8 +157,6 @@ class ReminderCommands(commands.Cog):
             restrict_to_user=ctx.author,
         )
 
-        db.close()
-
     @reminder.command(name="delete", description="Delete an existing reminder")
     async def delete(
         self,
@@ -172,25 +168,23 @@ class ReminderCommands(commands.Cog):
         """
         await ctx.defer()
 
-        db = database.Database().get()
+        async with database.session() as db:
+            table = db["remind_me"]
+            result = await table.find_one(id=reminder_id)
 
-        table = db["remind_me"]
-        result = table.find_one(id=reminder_id)
+            if not result:
+                return await embeds.error_message(ctx=ctx, description="Invalid ID.")
 
-        if not result:
-            return await embeds.error_message(ctx=ctx, description="Invalid ID.")
+            if result["author_id"] != ctx.author.id:
+                return await embeds.error_message(ctx=ctx, description="This reminder is not yours.")
 
-        if result["author_id"] != ctx.author.id:
-            return await embeds.error_message(ctx=ctx, description="This reminder is not yours.")
+            if result["sent"]:
+                return await embeds.error_message(ctx=ctx, description="This reminder has already been deleted.")
 
-        if result["sent"]:
-            return await embeds.error_message(ctx=ctx, description="This reminder has already been deleted.")
+            data = dict(id=reminder_id, sent=True)
+            await table.update(data, ["id"])
 
-        data = dict(id=reminder_id, sent=True)
-        table.update(data, ["id"])
-
-        db.commit()
-        db.close()
+        self.bot.dispatch("reminder_delete", reminder_id)
 
         embed = embeds.make_embed(
             ctx=ctx,
@@ -213,8 +207,6 @@ class ReminderCommands(commands.Cog):
         """
         await ctx.defer()
 
-        db = database.Database().get()
-
         confirm_embed = embeds.make_embed(
             description=f"{ctx.author.mention}, clear all your reminders? (yes/no/y/n)",
             color=discord.Color.blurple(),
@@ -232,21 +224,21 @@ class ReminderCommands(commands.Cog):
         try:
             msg = await self.bot.wait_for("message", timeout=60, check=check)
             if msg.content.lower() in ("no", "n"):
-                db.close()
                 embed = embeds.make_embed(
                     description=f"{ctx.author.mention}, your request has been canceled.",
                     color=discord.Color.blurple(),
                 )
                 return await ctx.send_followup(embed=embed)
         except asyncio.TimeoutError:
-            db.close()
             return await embeds.error_message(ctx, description=f"{ctx.author.mention}, your request has timed out.")
 
-        remind_me = db["remind_me"]
-        results = remind_me.find(author_id=ctx.author.id, sent=False)
-        for result in results:
-            updated_data = dict(id=result["id"], sent=True)
-            remind_me.update(updated_data, ["id"])
+        async with database.session() as db:
+            remind_me = db["remind_me"]
+            results = await remind_me.find(author_id=ctx.author.id, sent=False)
+            for result in results:
+                updated_data = dict(id=result["id"], sent=True)
+                await remind_me.update(updated_data, ["id"])
+                self.bot.dispatch("reminder_delete", result["id"])
 
         embed = embeds.make_embed(
             description=f"{ctx.author.mention}, all your reminders have been cleared.",
@@ -255,9 +247,6 @@ class ReminderCommands(commands.Cog):
 
         await ctx.send_followup(embed=embed)
 
-        db.commit()
-        db.close()
-
 
 def setup(bot: commands.Bot) -> None:
     bot.add_cog(ReminderCommands(bot))
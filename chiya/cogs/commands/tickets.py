@@ -0,0 +1,97 @@
+import io
+import logging
+
+import discord
+from discord.commands import Option, SlashCommandGroup, context
+from discord.ext import commands
+
+from chiya import config
+from chiya.utils import embeds, transcript
+from chiya.utils.pagination import LinePaginator
+
+
+log = logging.getLogger(__name__)
+
+
+class TicketCommands(commands.Cog):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    tickets = SlashCommandGroup(
+        "tickets",
+        "Search and read the logs of closed tickets",
+        guild_ids=config["guild_ids"],
+    )
+
+    @tickets.command(name="search", description="Search closed tickets by user or keywords")
+    @commands.has_role(config["roles"]["staff"])
+    async def search(
+        self,
+        ctx: context.ApplicationContext,
+        user: Option(discord.User, description="The user who opened the tickets", required=False),
+        keywords: Option(str, description="Words that all appear in the ticket log", required=False),
+    ) -> None:
+        """
+        Search the archived ticket logs by the user who opened them, the
+        words in them, or both.
+
+        The search runs against the local archive, so it does not depend on
+        PrivateBin being reachable. Tickets closed before the archive existed
+        are only found by user.
+        """
+        await ctx.defer()
+
+        if not user and not keywords:
+            return await embeds.error_message(ctx=ctx, description="Specify a user, keywords, or both!")
+
+        results = await transcript.search(user_id=user.id if user else None, keywords=keywords)
+        if not results:
+            return await embeds.error_message(ctx=ctx, description="No closed tickets found!")
+
+        tickets = []
+        for ticket in results:
+            ticket_log = ticket["log_url"] or f"`/tickets transcript {ticket['id']}`"
+            tickets.append(
+                (
+                    f"**ID: {ticket['id']}**\n"
+                    f"**Opened by:** <@!{ticket['user_id']}>\n"
+                    f"**Opened on:** <t:{ticket['timestamp']}:F>\n"
+                    f"**Subject:** {ticket['ticket_subject']}\n"
+                    f"**Log:** {ticket_log}"
+                )
+            )
+
+        embed = embeds.make_embed(title="Closed Tickets", color=discord.Color.blurple())
+        await LinePaginator.paginate(
+            lines=tickets,
+            ctx=ctx,
+            embed=embed,
+            max_lines=4,
+            max_size=2000,
+            linesep="\n\n",
+            timeout=120,
+        )
+
+    @tickets.command(name="transcript", description="Get the archived log of a closed ticket")
+    @commands.has_role(config["roles"]["staff"])
+    async def read_transcript(
+        self,
+        ctx: context.ApplicationContext,
+        ticket_id: Option(int, description="The ID of the ticket", required=True),
+    ) -> None:
+        """
+        Sends the archived log of a closed ticket as a text file.
+        """
+        await ctx.defer()
+
+        message_log = await transcript.load(ticket_id)
+        if message_log is None:
+            return await embeds.error_message(ctx=ctx, description="No archived log found for that ticket!")
+
+        log_file = discord.File(io.BytesIO(message_log.encode()), filename=f"ticket-{ticket_id}.txt")
+        await ctx.send_followup(file=log_file)
+
+
+def setup(bot: commands.Bot) -> None:
+    bot.add_cog(TicketCommands(bot))
+    log.info("Commands loaded: tickets")
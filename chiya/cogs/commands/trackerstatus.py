@@ -1,6 +1,13 @@
+import abc
+import asyncio
+import datetime
+import hashlib
+import json
 import logging
+import time
 
-import requests
+import aiohttp
+import discord
 from discord.commands import slash_command, context, Option
 from discord.ext import commands, tasks
 
@@ -9,72 +16,182 @@ from chiya.utils import embeds
 
 
 log = logging.getLogger(__name__)
-trackers = ["AR", "BTN", "GGn", "PTP", "RED", "OPS"]
+
+# Seconds between scheduler ticks, the timeout for a single source, and the longest backoff after failures.
+SCHEDULER_TICK = 15
+REQUEST_TIMEOUT = 10
+MAX_BACKOFF = 3600
+
+
+class StatusProvider(abc.ABC):
+    """
+    A source of tracker statuses polled by TrackerStatusCommands.
+
+    Subclasses declare the endpoint to poll, how often to poll it, and a `parse` method that turns a
+    successful response into a mapping of service names to "online", "unstable" or "offline".
+    """
+
+    interval = 60
+
+    def __init__(self, name: str, url: str, page: str = None, interval: int = None) -> None:
+        self.name = name
+        self.url = url
+        self.page = page
+        if interval:
+            self.interval = interval
+
+    @abc.abstractmethod
+    async def parse(self, response: aiohttp.ClientResponse) -> dict[str, str]:
+        ...
+
+
+class TrackerStatusProvider(StatusProvider):
+    """
+    A tracker monitored by trackerstatus.info, which publishes a status for each of its services.
+    """
+
+    states = {"1": "online", "2": "unstable", "0": "offline"}
+    ignored = ["tweet", "TrackerHTTPAddresses", "TrackerHTTPSAddresses"]
+
+    def __init__(self, name: str) -> None:
+        super().__init__(
+            name=name,
+            url=f"https://{name}.trackerstatus.info/api/status/",
+            page=f"https://{name}.trackerstatus.info/",
+        )
+
+    async def parse(self, response: aiohttp.ClientResponse) -> dict[str, str]:
+        response.raise_for_status()
+        data = await response.json(content_type=None)
+        return {key: self.states.get(value) for key, value in data.items() if key not in self.ignored}
+
+
+# TODO: Add providers for trackers that offer their own status page.
+# https://status.animebytes.tv/
+# http://about.empornium.ph/
+# https://status.myanonamouse.net/
+# http://is.morethantv.online/
+providers = [
+    TrackerStatusProvider("AR"),
+    TrackerStatusProvider("BTN"),
+    TrackerStatusProvider("GGn"),
+    TrackerStatusProvider("PTP"),
+    TrackerStatusProvider("RED"),
+    TrackerStatusProvider("OPS"),
+]
+trackers = [provider.name for provider in providers]
 
 
 class TrackerStatusCommands(commands.Cog):
-    # TODO: Add support for trackers that offer their own status page.
-    # https://status.animebytes.tv/
-    # http://about.empornium.ph/
-    # https://status.myanonamouse.net/
-    # http://is.morethantv.online/
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.session = None
+        self.providers = {provider.name: provider for provider in providers}
+        # The last good statuses for each tracker and when they were last confirmed to be current.
         self.cache = {}
+        self.updated_at = {}
+        # Embeds rendered from the cached statuses, rebuilt only when the hash of the statuses changes.
+        self.embeds = {}
+        self.digests = {}
+        # Conditional request headers, consecutive failures, and the next scheduled poll per tracker.
+        self.validators = {name: {} for name in self.providers}
+        self.failures = {name: 0 for name in self.providers}
+        self.next_poll = {name: 0.0 for name in self.providers}
         self.refresh_data.start()
 
     def cog_unload(self) -> None:
         self.refresh_data.cancel()
+        if self.session:
+            self.bot.loop.create_task(self.session.close())
 
-    @tasks.loop(seconds=60)
-    async def refresh_data(self):
+    @tasks.loop(seconds=SCHEDULER_TICK)
+    async def refresh_data(self) -> None:
         """
-        Grabs the latest API data from trackerstatus.info and caches it locally
-        every 60 seconds, respecting API limits.
+        Polls every provider whose interval has elapsed at once, sharing one connection pool.
         """
-        for tracker in trackers:
-            try:
-                r = requests.get(url=f"https://{tracker}.trackerstatus.info/api/status/")
-                r.raise_for_status()
-            except (requests.exceptions.RequestException, requests.exceptions.HTTPError) as e:
-                log.error(e)
-                pass
+        if not self.session:
+            self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT))
 
-            if r.status_code == 200:
-                self.cache[tracker] = r.json()
+        now = time.time()
+        due = [provider for provider in self.providers.values() if self.next_poll[provider.name] <= now]
+        await asyncio.gather(*(self.refresh_provider(provider) for provider in due))
+
+    async def refresh_provider(self, provider: StatusProvider) -> None:
+        """
+        Fetches one provider's statuses, keeping the last good snapshot and backing off
+        exponentially while the source is failing.
+        """
+        try:
+            async with self.session.get(url=provider.url, headers=self.validators[provider.name]) as r:
+                if r.status == 304 and provider.name in self.cache:
+                    data = self.cache[provider.name]
+                else:
+                    data = await provider.parse(r)
+                    self.validators[provider.name] = {
+                        header: r.headers[validator]
+                        for header, validator in (("If-None-Match", "ETag"), ("If-Modified-Since", "Last-Modified"))
+                        if validator in r.headers
+                    }
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            self.failures[provider.name] += 1
+            backoff = min(provider.interval * 2 ** (self.failures[provider.name] - 1), MAX_BACKOFF)
+            self.next_poll[provider.name] = time.time() + backoff
+            log.error(f"Unable to refresh {provider.name} tracker status, retrying in {backoff} seconds: {e!r}")
+            return
+
+        digest = hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+        if self.digests.get(provider.name) != digest:
+            self.embeds[provider.name] = self.render(provider, data)
+            self.digests[provider.name] = digest
+
+        self.cache[provider.name] = data
+        self.updated_at[provider.name] = time.time()
+        self.failures[provider.name] = 0
+        self.next_poll[provider.name] = time.time() + provider.interval
 
     def normalize_value(self, value):
         """
-        Converts API data values into user-friendly text with status availability icon.
+        Converts normalized statuses into user-friendly text with status availability icon.
         """
         match value:
-            case "1":
+            case "online":
                 return "<:status_online:596576749790429200> Online"
-            case "2":
+            case "unstable":
                 return "<:status_dnd:596576774364856321> Unstable"
-            case "0":
+            case "offline":
                 return "<:status_offline:596576752013279242> Offline"
 
+    def render(self, provider: StatusProvider, data: dict[str, str]) -> discord.Embed:
+        """
+        Builds the /trackerstatus embed for a provider's statuses, without the last updated footer.
+        """
+        # TODO: Change the color of the embed to green if all services are online,
+        # yellow if one of the services is offline, and grey or red if all are offline.
+        embed = embeds.make_embed(title=f"Tracker Status: {provider.name}", title_url=provider.page)
+        for key, value in data.items():
+            embed.add_field(name=key, value=self.normalize_value(value), inline=True)
+        return embed
+
     @slash_command(guild_ids=config["guild_ids"], description="Get tracker uptime statuses")
     async def trackerstatus(
         self,
         ctx: context.ApplicationContext,
         tracker: Option(str, description="Tracker to get uptime statuses for", choices=trackers, required=True),
     ) -> None:
-        # TODO: Change the color of the embed to green if all services are online,
-        # yellow if one of the services is offline, and grey or red if all are offline.
         await ctx.defer()
 
-        embed = embeds.make_embed(
-            ctx=ctx,
-            title=f"Tracker Status: {tracker}",
-        )
-
-        for key, value in self.cache[tracker].items():
-            # Skip over any keys that we don't want to return in the embed.
-            if key in ["tweet", "TrackerHTTPAddresses", "TrackerHTTPSAddresses"]:
-                continue
-            embed.add_field(name=key, value=self.normalize_value(value), inline=True)
+        # Nothing can be served until the first successful poll, which may still be in flight or backing off.
+        if tracker not in self.embeds:
+            return await embeds.error_message(
+                ctx=ctx, description=f"The status of {tracker} has not been fetched yet, please try again later."
+            )
+
+        # Served from the last good snapshot, the footer warns when it is older than a couple of polls.
+        updated_at = self.updated_at[tracker]
+        stale = time.time() - updated_at > self.providers[tracker].interval * 2
+        embed = self.embeds[tracker].copy()
+        embed.set_footer(text="Stale data, the status source is unreachable. Last updated" if stale else "Last updated")
+        embed.timestamp = datetime.datetime.fromtimestamp(updated_at)
 
         await ctx.send_followup(embed=embed)
 
@@ -81,19 +81,16 @@ class WarnCommands(commands.Cog):
                 ),
             )
 
-        db = database.Database().get()
-        db["mod_logs"].insert(
-            dict(
-                user_id=member.id,
-                mod_id=ctx.author.id,
-                timestamp=int(time.time()),
-                reason=reason,
-                type="warn",
+        async with database.session() as db:
+            await db["mod_logs"].insert(
+                dict(
+                    user_id=member.id,
+                    mod_id=ctx.author.id,
+                    timestamp=int(time.time()),
+                    reason=reason,
+                    type="warn",
+                )
             )
-        )
-
-        db.commit()
-        db.close()
 
         await ctx.send_followup(embed=embed)
 
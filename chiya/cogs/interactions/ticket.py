@@ -1,14 +1,15 @@
+import io
 import logging
 import time
 
 import discord
-import privatebinapi
 from discord.commands import context
 from discord.ext import commands
 from discord.ui import InputText, Modal
 
 from chiya import config, database
-from chiya.utils import embeds
+from chiya.utils import embeds, transcript
+from chiya.utils.helpers import is_staff
 
 
 log = logging.getLogger(__name__)
@@ -116,21 +117,18 @@ class TicketSubmissionModal(Modal):
         )
         await interaction.response.send_message(embed=embed, view=None, ephemeral=True)
 
-        db = database.Database().get()
-        db["tickets"].insert(
-            dict(
-                user_id=interaction.user.id,
-                guild=interaction.guild.id,
-                timestamp=int(time.time()),
-                ticket_subject=ticket_subject,
-                ticket_message=ticket_message,
-                log_url=None,
-                status=False,
+        async with database.session() as db:
+            await db["tickets"].insert(
+                dict(
+                    user_id=interaction.user.id,
+                    guild=interaction.guild.id,
+                    timestamp=int(time.time()),
+                    ticket_subject=ticket_subject,
+                    ticket_message=ticket_message,
+                    log_url=None,
+                    status=False,
+                )
             )
-        )
-
-        db.commit()
-        db.close()
 
 
 class TicketCreateButton(discord.ui.View):
@@ -178,37 +176,53 @@ class TicketCloseButton(discord.ui.View):
         )
         await interaction.response.send_message(embed=close_embed)
 
-        db = database.Database().get()
-        table = db["tickets"]
-        ticket = table.find_one(user_id=int(interaction.channel.name.replace("ticket-", "")), status=False)
         ticket_creator_id = int(interaction.channel.name.replace("ticket-", ""))
+        async with database.session() as db:
+            ticket = await db["tickets"].find_one(user_id=ticket_creator_id, status=False)
         ticket_subject = ticket["ticket_subject"]
         ticket_message = ticket["ticket_message"]
 
-        role_staff = discord.utils.get(interaction.guild.roles, id=config["roles"]["staff"])
-        role_trial_mod = discord.utils.get(interaction.guild.roles, id=config["roles"]["trial"])
-
         member = discord.utils.get(interaction.guild.members, id=ticket_creator_id)
         if not member:
             member = await interaction.client.fetch_user(ticket_creator_id)
 
         mod_list = set()
-        mod_roles = (role_staff, role_trial_mod)
-        message_log = f"Ticket Creator: {member}\nTicket Subject: {ticket_subject}\nTicket Message: {ticket_message}\nUser ID: {member.id}\n\n"
+        message_log = io.StringIO()
+        message_log.write(
+            f"Ticket Creator: {member}\nTicket Subject: {ticket_subject}\nTicket Message: {ticket_message}\n"
+            f"User ID: {member.id}\n\n"
+        )
 
         async for message in interaction.channel.history(oldest_first=True, limit=None):
             if message.author.bot:
                 continue
 
-            formatted_time = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
-            message_log += f"[{formatted_time}] {message.author}: {message.content}\n"
-            # Cannot do role check on participants who left the server (no role attribute).
-            if isinstance(message.author, discord.Member) and any(role in mod_roles for role in message.author.roles):
+            transcript.write_message(message_log, message)
+            # Participants who left the server are never counted (no role attribute).
+            if is_staff(message.author):
                 mod_list.add(message.author)
 
         value = " ".join(mod.mention for mod in mod_list) if mod_list else mod_list.add("None")
-        url = privatebinapi.send(config["privatebin"]["url"], text=message_log, expiration="never")["full_url"]
-        
+        message_log = message_log.getvalue()
+        try:
+            await transcript.archive(ticket, interaction.channel.name, message_log)
+        except Exception as e:
+            log.error(f"Unable to archive the log of {interaction.channel.name}: {e!r}")
+            error_embed = embeds.make_embed(
+                color=discord.Color.red(),
+                title="Error:",
+                description="Unable to archive this ticket, please try closing it again later.",
+            )
+            return await interaction.followup.send(embed=error_embed)
+
+        # The archive is the copy of record, PrivateBin only provides a link that can be shared outside of the server.
+        url = None
+        if config.get("privatebin", {}).get("url"):
+            try:
+                url = await transcript.upload(message_log)
+            except Exception as e:
+                log.error(f"Unable to upload the log of {interaction.channel.name} to PrivateBin: {e!r}")
+
         log_embed = embeds.make_embed(
             title=f"{interaction.channel.name} archived",
             thumbnail_url="https://i.imgur.com/A4c19BJ.png",
@@ -219,7 +233,11 @@ class TicketCloseButton(discord.ui.View):
                 {"name": "Ticket Subject:", "value": ticket_subject, "inline": False},
                 {"name": "Ticket Message:", "value": ticket_message, "inline": False},
                 {"name": "Participating Moderators:", "value": value, "inline": False},
-                {"name": "Ticket Log:", "value": url, "inline": False},
+                {
+                    "name": "Ticket Log:",
+                    "value": url or f"Archived, use `/tickets transcript {ticket['id']}` to read it",
+                    "inline": False,
+                },
             ],
         )
         ticket_log = discord.utils.get(interaction.guild.channels, id=config["channels"]["logs"]["ticket_log"])
@@ -240,19 +258,21 @@ class TicketCloseButton(discord.ui.View):
                         "value": f"[{interaction.guild.name}]({await interaction.guild.vanity_invite()})",
                         "inline": True,
                     },
-                    {"name": "Ticket Log:", "value": url, "inline": False},
+                    {"name": "Ticket Log:", "value": url or "Attached", "inline": False},
                 ],
             )
-            await member.send(embed=dm_embed)
+            if url:
+                await member.send(embed=dm_embed)
+            else:
+                log_file = discord.File(io.BytesIO(message_log.encode()), filename=f"{interaction.channel.name}.txt")
+                await member.send(embed=dm_embed, file=log_file)
         except discord.Forbidden:
             logging.info(f"Unable to send ticket log to {member} because their DM is closed")
 
         ticket["status"] = True
         ticket["log_url"] = url
-        table.update(ticket, ["id"])
-
-        db.commit()
-        db.close()
+        async with database.session() as db:
+            await db["tickets"].update(ticket, ["id"])
 
         await interaction.channel.delete()
 
@@ -1,8 +1,12 @@
 import logging
-import re
+from datetime import datetime, timedelta
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
+
+from chiya import config
+from chiya.utils import pipeline
+from chiya.utils.automod import ACTIONS, DEFAULT_RULES, DomainIndex, RuleEngine, SpamDetector, extract_hosts
 
 
 log = logging.getLogger(__name__)
@@ -11,27 +15,85 @@ log = logging.getLogger(__name__)
 class AutomodListener(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        self.engine = RuleEngine(config.get("automod", {}).get("rules") or DEFAULT_RULES)
+        self.spam = config.get("automod", {}).get("spam") or {}
+        self.spam_detector = SpamDetector(
+            window=self.spam.get("window", 10),
+            max_messages=self.spam.get("max_messages", 8),
+            max_duplicates=self.spam.get("max_duplicates", 4),
+        )
+        self.scam_domains = config.get("automod", {}).get("scam_domains") or {}
+        self.domain_index = DomainIndex(self.scam_domains.get("path", "scam_domains.txt"))
+        self.scam_action = self.scam_domains.get("action", "ban")
+        if self.scam_action not in ACTIONS:
+            log.warning(f"Invalid scam domain action {self.scam_action}, banning instead")
+            self.scam_action = "ban"
+        self.reload_scam_domains.start()
+        # Runs before every other stage so that nothing responds to a message that is about to be removed.
+        pipeline.register_stage("automod", self.scan_message, priority=0)
+
+    def cog_unload(self) -> None:
+        self.reload_scam_domains.cancel()
+        pipeline.unregister_stage("automod")
+
+    @tasks.loop(seconds=60)
+    async def reload_scam_domains(self) -> None:
+        """
+        Picks up changes to the scam domain list without a restart, reading it off the event loop.
+        """
+        try:
+            await self.bot.loop.run_in_executor(None, self.domain_index.reload)
+        except Exception as e:
+            log.error(f"Unable to load the scam domain list: {e}")
+
+    def check_scam_domains(self, urls: list[str]) -> dict | None:
+        """
+        Returns a rule for the scam domain action if the message links to a listed domain.
+        """
+        if not self.domain_index.domains or not urls:
+            return None
+
+        for host in extract_hosts(urls):
+            domain = self.domain_index.match(host)
+            if domain:
+                return dict(
+                    name="scam_domain",
+                    action=self.scam_action,
+                    reason=f"Posted a link to a known scam domain: {domain}",
+                    severity=ACTIONS.index(self.scam_action),
+                )
+        return None
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message) -> None:
+    async def scan_message(self, ctx: pipeline.MessageContext) -> None:
         """
         Scan incoming messages for problematic content and action the
         message (and the user) accordingly.
         """
-        # Ignore messages from bots (includes itself).
-        if message.author.bot:
-            return
-
-        # Remove message containing Cyrillic characters (used for bypassing automod).
-        if bool(re.search("[\u0400-\u04FF]", message.clean_content)):
-            await message.delete()
-
-        # Remove message and ban user if "@everyone" and "nitro" are in the same message (nitro scam behavior).
-        if all(match in message.content for match in ["nitro", "@everyone"]):
-            await message.delete()
-            await message.guild.ban(
-                user=message.author, reason="Banned by potential Nitro scam link detection", delete_message_days=1
-            )
+        message = ctx.message
+        rule = self.engine.scan(ctx.content, ctx.lower_content)
+        scam = self.check_scam_domains(ctx.urls)
+        if scam and (not rule or scam["severity"] >= rule["severity"]):
+            rule = scam
+
+        if not rule:
+            # Staff repeating a notice or a canned response across channels isn't spam.
+            if ctx.is_staff:
+                return
+            reason = self.spam_detector.check(message.author.id, message.channel.id, ctx.content)
+            if not reason:
+                return
+            rule = dict(name="spam", action="timeout", reason=reason, duration=self.spam.get("duration", 600))
+
+        # Every action removes the message, so it is only ever deleted once.
+        log.info(f"Automod rule {rule['name']} matched a message from {message.author}: {rule['action']}")
+        await ctx.delete()
+
+        match rule["action"]:
+            case "timeout" if isinstance(message.author, discord.Member):
+                until = datetime.utcnow() + timedelta(seconds=rule.get("duration", 3600))
+                await message.author.timeout(until=until, reason=rule.get("reason"))
+            case "ban":
+                await message.guild.ban(user=message.author, reason=rule.get("reason"), delete_message_days=1)
 
 
 def setup(bot: commands.Bot) -> None:
@@ -23,18 +23,16 @@ class BanListeners(commands.Cog):
         ban_entry = await guild.fetch_ban(user)
         logs = await guild.audit_logs(limit=1, action=discord.AuditLogAction.ban).flatten()
         if logs[0].user != self.bot.user:
-            db = database.Database().get()
-            db["mod_logs"].insert(
-                dict(
-                    user_id=user.id,
-                    mod_id=logs[0].user.id,
-                    timestamp=int(time.time()),
-                    reason=ban_entry.reason,
-                    type="ban",
+            async with database.session() as db:
+                await db["mod_logs"].insert(
+                    dict(
+                        user_id=user.id,
+                        mod_id=logs[0].user.id,
+                        timestamp=int(time.time()),
+                        reason=ban_entry.reason,
+                        type="ban",
+                    )
                 )
-            )
-            db.commit()
-            db.close()
 
 
 def setup(bot: commands.Bot) -> None:
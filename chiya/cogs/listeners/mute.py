@@ -24,18 +24,16 @@ class MuteListeners(commands.Cog):
                 limit=1, action=discord.AuditLogAction.member_update
             ).flatten()
             if logs[0].user != self.bot.user:
-                db = database.Database().get()
-                db["mod_logs"].insert(
-                    dict(
-                        user_id=after.id,
-                        mod_id=logs[0].user.id,
-                        timestamp=int(time.time()),
-                        reason=logs[0].reason,
-                        type="mute",
+                async with database.session() as db:
+                    await db["mod_logs"].insert(
+                        dict(
+                            user_id=after.id,
+                            mod_id=logs[0].user.id,
+                            timestamp=int(time.time()),
+                            reason=logs[0].reason,
+                            type="mute",
+                        )
                     )
-                )
-                db.commit()
-                db.close()
 
 
 def setup(bot: commands.Bot) -> None:
@@ -0,0 +1,31 @@
+import logging
+
+import discord
+from discord.ext import commands
+
+from chiya.utils import pipeline
+
+
+log = logging.getLogger(__name__)
+
+
+class MessagePipelineListener(commands.Cog):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_message(self, message: discord.Message) -> None:
+        """
+        Passes every incoming message through the stages registered by the
+        other listeners (automod, autoresponder, ...) in a single pass.
+        """
+        # Ignore messages from bots (includes itself).
+        if message.author.bot:
+            return
+
+        await pipeline.dispatch(message)
+
+
+def setup(bot: commands.Bot) -> None:
+    bot.add_cog(MessagePipelineListener(bot))
+    log.info("Listener loaded: pipeline")
@@ -0,0 +1,31 @@
+import logging
+
+import discord
+from discord.ext import commands
+
+from chiya.utils.helpers import invalidate_role_ids
+
+
+log = logging.getLogger(__name__)
+
+
+class RoleCacheListener(commands.Cog):
+    def __init__(self, bot: commands.Bot) -> None:
+        self.bot = bot
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        """
+        Drops the member's cached role IDs when their roles change so that staff checks see the new roles.
+        """
+        if before.roles != after.roles:
+            invalidate_role_ids(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member: discord.Member) -> None:
+        invalidate_role_ids(member)
+
+
+def setup(bot: commands.Bot) -> None:
+    bot.add_cog(RoleCacheListener(bot))
+    log.info("Listener loaded: roles")
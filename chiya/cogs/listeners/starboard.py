@@ -1,20 +1,53 @@
+import asyncio
 import datetime
 import logging
+from collections import Counter
 
 import discord
-from discord.ext import commands
+from discord.ext import commands, tasks
 
 from chiya import config, database
 from chiya.utils import embeds
+from chiya.utils.cache import TTLCache
+from chiya.utils.locks import KeyedLock
 
 
 log = logging.getLogger(__name__)
 
+STARS = ("⭐", "🌟", "💫", "✨")
+# How long to collect reaction changes on a starred message before editing its star embed once.
+EDIT_DELAY = 5
+# Messages read from a channel's history at a time when reconciling, and the pause between pages.
+RECONCILE_PAGE_SIZE = 100
+RECONCILE_PAGE_DELAY = 1
+# Pages read ahead of the one being reconciled, reading history pauses while the queue is full.
+RECONCILE_QUEUE_SIZE = 2
+
 
 class Starboard(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.cache = []
+        self.blacklist = set(config["channels"]["starboard"]["blacklisted"])
+        # Messages fetched recently, for those that aren't in the client's own message cache.
+        self.messages = TTLCache(maxsize=1000, ttl=60 * 60)
+        # Serializes everything done for a message, so that concurrent reactions can't post it twice.
+        self.locks = KeyedLock()
+        # The star embed ID of each recently active message, or None if it isn't on the starboard.
+        self.star_embeds = TTLCache(maxsize=5000, ttl=24 * 60 * 60)
+        # The users who starred each recently active message, as {message_id: {user_id: {emoji, ...}}}.
+        self.tallies = TTLCache(maxsize=5000, ttl=24 * 60 * 60)
+        # The last content and embed sent for each star embed, so that they can be edited without a fetch.
+        self.posts = TTLCache(maxsize=1000, ttl=24 * 60 * 60)
+        # The latest (message, star_count) waiting to be applied to each starred message.
+        self.pending = {}
+
+        self.reconcile_config = config["channels"]["starboard"].get("reconcile") or {}
+        if self.reconcile_config.get("channels"):
+            self.reconcile.change_interval(minutes=self.reconcile_config.get("interval", 60))
+            self.reconcile.start()
+
+    def cog_unload(self) -> None:
+        self.reconcile.cancel()
 
     def generate_color(self, star_count: int) -> int:
         """
@@ -40,69 +73,120 @@ class Starboard(commands.Cog):
         else:
             return "✨"
 
-    async def get_star_count(self, message: discord.Message, stars: tuple) -> int:
-        unique_users = set()
+    async def count_stars(self, message: discord.Message, stored: dict[int, set[str]]) -> dict[int, set[str]]:
+        """
+        Builds the tally of a message from scratch by paging through the users of each star reaction, and
+        brings the stored tally in line with it.
+        """
+        tally = {}
         for reaction in message.reactions:
-            if reaction.emoji not in stars:
+            if reaction.emoji not in STARS:
                 continue
             async for user in reaction.users():
-                unique_users.add(user.id)
-
-        return len(unique_users)
+                tally.setdefault(user.id, set()).add(reaction.emoji)
+
+        counted = {(user_id, emoji) for user_id, emojis in tally.items() for emoji in emojis}
+        stored = {(user_id, emoji) for user_id, emojis in stored.items() for emoji in emojis}
+        async with database.session() as db:
+            for user_id, emoji in stored - counted:
+                await db["starboard_stars"].delete(message_id=message.id, user_id=user_id, emoji=emoji)
+            for user_id, emoji in counted - stored:
+                await db["starboard_stars"].insert(
+                    dict(channel_id=message.channel.id, message_id=message.id, user_id=user_id, emoji=emoji)
+                )
+        return tally
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_add(self, payload):
+    async def load_stars(self, message_id: int) -> dict[int, set[str]]:
         """
-        If a message was reacted with 5 or more stars, send an embed to the starboard channel, as well as update the star
-        count in the embed if more stars were reacted.
+        Returns the tally of a message as it was last stored in the database.
+        """
+        async with database.session() as db:
+            rows = await db["starboard_stars"].find(message_id=message_id)
+
+        tally = {}
+        for row in rows:
+            tally.setdefault(row["user_id"], set()).add(row["emoji"])
+        return tally
 
-        Implements a "cache" to prevent race condition where if multiple stars were reacted on a message after it hit the
-        star threshold and the IDs were not written to the database quickly enough, a duplicated star embed would be sent.
+    async def check_stars(self, message: discord.Message, tally: dict[int, set[str]]) -> dict[int, set[str]]:
         """
-        stars = ("⭐", "🌟", "💫", "✨")
-        if payload.emoji.name not in stars:
-            return
+        Returns the tally of a message, recounted if it no longer adds up to the reaction counts on the message.
+        """
+        counts = {reaction.emoji: reaction.count for reaction in message.reactions if reaction.emoji in STARS}
+        if Counter(emoji for emojis in tally.values() for emoji in emojis) != counts:
+            log.info(f"Recounting the stars on {message.id}, the stored tally is out of date")
+            return await self.count_stars(message, tally)
+        return tally
 
-        channel = self.bot.get_channel(payload.channel_id)
-        message = await channel.fetch_message(payload.message_id)
-        star_count = await self.get_star_count(message, stars)
-
-        if (
-            message.author.bot
-            or message.author.id == payload.member.id
-            or channel.is_nsfw()
-            or payload.channel_id in config["channels"]["starboard"]["blacklisted"]
-            or star_count < config["channels"]["starboard"]["star_limit"]
-            or (payload.message_id, payload.channel_id) in self.cache
-        ):
-            return
+    async def get_message(self, channel: discord.TextChannel, message_id: int) -> discord.Message:
+        """
+        Returns a message from the client's message cache or the recently fetched messages, and only
+        fetches it if neither has it.
+        """
+        message = discord.utils.get(self.bot.cached_messages, id=message_id) or self.messages.get(message_id)
+        if not message:
+            message = await channel.fetch_message(message_id)
+            self.messages.set(message_id, message)
+        return message
 
-        self.cache.append((payload.channel_id, payload.message_id))
+    async def update_star_count(self, channel: discord.TextChannel, payload: discord.RawReactionActionEvent) -> int:
+        """
+        Applies a star reaction change to the tally of the message and returns its star count.
 
-        starboard_channel = discord.utils.get(message.guild.channels, id=config["channels"]["starboard"]["channel_id"])
+        The tally is loaded from the database the first time a message is seen since the bot started (or since
+        it was evicted from memory), and checked against the reaction counts on the message, since stars added
+        or removed while the bot was offline were never stored. That takes at most one fetch per message, the
+        message is kept in `get_message`'s caches for the reactions that follow.
+        """
+        row = dict(channel_id=payload.channel_id, message_id=payload.message_id, user_id=payload.user_id)
+        emoji = payload.emoji.name
+
+        tally = self.tallies.get(payload.message_id)
+        loaded = tally is None
+        if loaded:
+            tally = await self.load_stars(payload.message_id)
+
+        async with database.session() as db:
+            if payload.event_type == "REACTION_ADD":
+                tally.setdefault(payload.user_id, set()).add(emoji)
+                await db["starboard_stars"].upsert(dict(row, emoji=emoji), ["message_id", "user_id", "emoji"])
+            else:
+                emojis = tally.get(payload.user_id, set())
+                emojis.discard(emoji)
+                if not emojis:
+                    tally.pop(payload.user_id, None)
+                await db["starboard_stars"].delete(**row, emoji=emoji)
+
+        if loaded:
+            message = await self.get_message(channel, payload.message_id)
+            tally = await self.check_stars(message, tally)
+
+        self.tallies.set(payload.message_id, tally)
+        return len(tally)
+
+    async def get_star_embed_id(self, channel_id: int, message_id: int) -> int | None:
+        """
+        Returns the ID of the star embed of a message if it is on the starboard, only querying the
+        database the first time the message is seen.
+        """
+        if message_id not in self.star_embeds:
+            async with database.session() as db:
+                result = await db["starboard"].find_one(channel_id=channel_id, message_id=message_id)
+            self.star_embeds.set(message_id, result["star_embed_id"] if result else None)
+        return self.star_embeds.get(message_id)
 
-        db = database.Database().get()
-        result = db["starboard"].find_one(channel_id=payload.channel_id, message_id=payload.message_id)
+    def render(self, message: discord.Message, star_count: int) -> str:
+        return f"{self.generate_star(star_count)} **{star_count}** {message.channel.mention}"
 
-        if result:
-            try:
-                star_embed = await starboard_channel.fetch_message(result["star_embed_id"])
-                embed_dict = star_embed.embeds[0].to_dict()
-                embed_dict["color"] = self.generate_color(star_count=star_count)
-                embed = discord.Embed.from_dict(embed_dict)
-                db.close()
-                self.cache.remove((payload.channel_id, payload.message_id))
-                return await star_embed.edit(
-                    content=f"{self.generate_star(star_count)} **{star_count}** {message.channel.mention}",
-                    embed=embed,
-                )
-            # Star embed found in database but the actual star embed was deleted.
-            except discord.NotFound:
-                pass
+    async def post(self, message: discord.Message, star_count: int) -> None:
+        """
+        Sends a new star embed for the message to the starboard channel and records it.
+        """
+        starboard_channel = discord.utils.get(message.guild.channels, id=config["channels"]["starboard"]["channel_id"])
 
         embed = embeds.make_embed(
             color=self.generate_color(star_count=star_count),
-            footer=payload.message_id,
+            footer=message.id,
             timestamp=datetime.datetime.now(),
             fields=[{"name": "Source:", "value": f"[Jump!]({message.jump_url})", "inline": False}],
         )
@@ -117,69 +201,234 @@ class Starboard(commands.Cog):
         embed.description = description
         embed.set_author(name=message.author.display_name, icon_url=message.author.display_avatar)
 
-        starred_message = await starboard_channel.send(
-            content=f"{self.generate_star(star_count)} **{star_count}** {message.channel.mention}", embed=embed
-        )
+        content = self.render(message, star_count)
+        starred_message = await starboard_channel.send(content=content, embed=embed)
+        self.posts.set(starred_message.id, dict(content=content, embed=embed))
 
-        # Update the star embed ID since the original one was probably deleted.
-        if result:
-            result["star_embed_id"] = starred_message.id
-            db["starboard"].update(result, ["id"])
-        else:
+        # Replaces the star embed ID if the message was on the starboard before but its embed was deleted.
+        async with database.session() as db:
             data = dict(
-                channel_id=payload.channel_id,
-                message_id=payload.message_id,
+                channel_id=message.channel.id,
+                message_id=message.id,
                 star_embed_id=starred_message.id,
             )
-            db["starboard"].insert(data, ["id"])
-
-        db.commit()
-        db.close()
-        self.cache.remove((payload.channel_id, payload.message_id))
+            await db["starboard"].upsert(data, ["channel_id", "message_id"])
+        self.star_embeds.set(message.id, starred_message.id)
 
-    @commands.Cog.listener()
-    async def on_raw_reaction_remove(self, payload):
+    def schedule_edit(self, message: discord.Message, star_count: int) -> None:
         """
-        Update the star count in the embed if the stars were reacted. Delete star embed if the star count is below threshold.
+        Queues an update of the star embed of a message. Every change within EDIT_DELAY seconds of the first
+        one only replaces the queued star count, so a burst of stars results in a single edit.
         """
-        stars = ("⭐", "🌟", "💫", "✨")
-        if payload.emoji.name not in stars:
-            return
-
-        message = await self.bot.get_channel(payload.channel_id).fetch_message(payload.message_id)
+        queued = message.id in self.pending
+        self.pending[message.id] = (message, star_count)
+        if not queued:
+            self.bot.loop.create_task(self.flush_edit(message.id))
 
-        db = database.Database().get()
-        result = db["starboard"].find_one(channel_id=payload.channel_id, message_id=payload.message_id)
+    async def flush_edit(self, message_id: int) -> None:
+        """
+        Applies the last queued star count of a message to its star embed, deleting it if the message
+        dropped below the star limit.
+        """
+        await asyncio.sleep(EDIT_DELAY)
+        async with self.locks(message_id):
+            message, star_count = self.pending.pop(message_id)
+            try:
+                await self.edit(message, star_count)
+            except Exception:
+                log.exception(f"Unable to update the star embed of {message_id}")
 
-        if not result:
-            db.close()
+    async def edit(self, message: discord.Message, star_count: int) -> None:
+        star_embed_id = await self.get_star_embed_id(message.channel.id, message.id)
+        if not star_embed_id:
             return
 
         starboard_channel = discord.utils.get(message.guild.channels, id=config["channels"]["starboard"]["channel_id"])
+        star_embed = starboard_channel.get_partial_message(star_embed_id)
 
         try:
-            star_embed = await starboard_channel.fetch_message(result["star_embed_id"])
+            if star_count < config["channels"]["starboard"]["star_limit"]:
+                self.posts.pop(star_embed.id)
+                self.star_embeds.set(message.id, None)
+                async with database.session() as db:
+                    await db["starboard"].delete(channel_id=message.channel.id, message_id=message.id)
+                return await star_embed.delete()
+
+            # The embed is only fetched if it was posted before the bot started or fell out of the cache.
+            post = self.posts.get(star_embed.id)
+            if not post:
+                fetched = await star_embed.fetch()
+                post = dict(content=fetched.content, embed=fetched.embeds[0])
+
+            content = self.render(message, star_count)
+            color = self.generate_color(star_count=star_count)
+            if content == post["content"] and post["embed"].color.value == color:
+                return self.posts.set(star_embed.id, post)
+
+            embed = post["embed"].copy()
+            embed.color = color
+            await star_embed.edit(content=content, embed=embed)
+            self.posts.set(star_embed.id, dict(content=content, embed=embed))
+        # Star embed found in database but the actual star embed was deleted.
         except discord.NotFound:
-            db.close()
+            self.posts.pop(star_embed.id)
+            if star_count >= config["channels"]["starboard"]["star_limit"]:
+                await self.post(message, star_count)
+
+    @tasks.loop(minutes=60)
+    async def reconcile(self) -> None:
+        """
+        Brings the starboard in line with the star reactions in the recent history of the configured
+        channels, picking up stars that were added or removed while the bot was offline.
+        """
+        await self.bot.wait_until_ready()
+
+        for channel_id in self.reconcile_config["channels"]:
+            channel = self.bot.get_channel(channel_id)
+            if not channel or channel.is_nsfw() or channel_id in self.blacklist:
+                continue
+
+            try:
+                await self.reconcile_channel(channel)
+            except Exception:
+                log.exception(f"Unable to reconcile the starboard with #{channel}")
+
+    async def reconcile_channel(self, channel: discord.TextChannel) -> None:
+        """
+        Reads the history of a channel a page at a time, oldest first, from where the last pass stopped or
+        `lookback_days` ago, and hands the pages to a worker through a bounded queue. The worker saves its
+        position after each page, so an interrupted pass resumes there, and the position is cleared once
+        the pass reaches the end of the channel so that the next one starts over.
+        """
+        checkpoint_name = f"starboard_reconcile_{channel.id}"
+        async with database.session() as db:
+            checkpoint = await db["bot_state"].find_one(name=checkpoint_name)
+
+        if checkpoint:
+            after = discord.Object(id=int(checkpoint["value"]))
+        else:
+            after = discord.utils.utcnow() - datetime.timedelta(days=self.reconcile_config.get("lookback_days", 7))
+
+        queue = asyncio.Queue(maxsize=RECONCILE_QUEUE_SIZE)
+        worker = self.bot.loop.create_task(self.reconcile_worker(queue, checkpoint_name))
+        try:
+            while True:
+                page = await channel.history(limit=RECONCILE_PAGE_SIZE, after=after, oldest_first=True).flatten()
+                if page:
+                    await queue.put(page)
+                    after = page[-1]
+                if len(page) < RECONCILE_PAGE_SIZE:
+                    break
+                await asyncio.sleep(RECONCILE_PAGE_DELAY)
+
+            await queue.put(None)
+            await worker
+        finally:
+            worker.cancel()
+
+        async with database.session() as db:
+            await db["bot_state"].delete(name=checkpoint_name)
+
+    async def reconcile_worker(self, queue: asyncio.Queue, checkpoint_name: str) -> None:
+        while page := await queue.get():
+            try:
+                await self.reconcile_page(page)
+                async with database.session() as db:
+                    await db["bot_state"].upsert(dict(name=checkpoint_name, value=str(page[-1].id)), ["name"])
+            except Exception:
+                log.exception(f"Unable to reconcile the starboard from {page[0].id} to {page[-1].id}")
+
+    async def reconcile_page(self, page: list[discord.Message]) -> None:
+        """
+        Creates, updates, or deletes the star embeds of a page of messages, loading what is stored about
+        all of them in two queries.
+        """
+        message_ids = [message.id for message in page]
+        async with database.session() as db:
+            star_rows = await db["starboard_stars"].find(message_id=message_ids)
+            starboard_rows = await db["starboard"].find(channel_id=page[0].channel.id, message_id=message_ids)
+
+        stored = {}
+        for row in star_rows:
+            stored.setdefault(row["message_id"], {}).setdefault(row["user_id"], set()).add(row["emoji"])
+        star_embed_ids = {row["message_id"]: row["star_embed_id"] for row in starboard_rows}
+
+        for message in page:
+            try:
+                async with self.locks(message.id):
+                    await self.reconcile_message(message, stored.get(message.id, {}), star_embed_ids.get(message.id))
+            except Exception:
+                log.exception(f"Unable to reconcile the stars on {message.id}")
+
+    async def reconcile_message(
+        self, message: discord.Message, stored: dict[int, set[str]], star_embed_id: int | None
+    ) -> None:
+        # A tally in memory has every reaction since it was loaded applied to it, so it is never older than the page.
+        tally = self.tallies.get(message.id)
+        if tally is None:
+            tally = await self.check_stars(message, stored)
+            if tally:
+                self.tallies.set(message.id, tally)
+        if message.id not in self.star_embeds:
+            self.star_embeds.set(message.id, star_embed_id)
+
+        star_count = len(tally)
+        if self.star_embeds.get(message.id):
+            await self.edit(message, star_count)
+        elif star_count >= config["channels"]["starboard"]["star_limit"] and not message.author.bot:
+            await self.post(message, star_count)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_add(self, payload):
+        """
+        If a message was reacted with 5 or more stars, send an embed to the starboard channel, as well as update the star
+        count in the embed if more stars were reacted.
+
+        Every reaction on a message is handled under the same lock, so that when several stars arrive at once
+        after a message hit the star threshold, only the first one posts it and the rest update its embed.
+
+        Everything that can be checked from the payload and the channel cache is checked first, and the message
+        is only looked up once it has enough stars to be posted.
+        """
+        if payload.emoji.name not in STARS or payload.channel_id in self.blacklist:
             return
 
-        star_count = await self.get_star_count(message, stars)
+        channel = self.bot.get_channel(payload.channel_id)
+        if not channel or channel.is_nsfw():
+            return
 
-        if star_count < config["channels"]["starboard"]["star_limit"]:
-            db["starboard"].delete(channel_id=payload.channel_id, message_id=payload.message_id)
-            db.commit()
-            db.close()
-            return await star_embed.delete()
+        async with self.locks(payload.message_id):
+            star_count = await self.update_star_count(channel, payload)
+            if star_count < config["channels"]["starboard"]["star_limit"]:
+                return
 
-        embed_dict = star_embed.embeds[0].to_dict()
-        embed_dict["color"] = self.generate_color(star_count=star_count)
-        embed = discord.Embed.from_dict(embed_dict)
-        await star_embed.edit(
-            content=f"{self.generate_star(star_count)} **{star_count}** {message.channel.mention}",
-            embed=embed,
-        )
+            message = await self.get_message(channel, payload.message_id)
+            if message.author.bot or message.author.id == payload.user_id:
+                return
+
+            if await self.get_star_embed_id(payload.channel_id, payload.message_id):
+                self.schedule_edit(message, star_count)
+            else:
+                await self.post(message, star_count)
+
+    @commands.Cog.listener()
+    async def on_raw_reaction_remove(self, payload):
+        """
+        Update the star count in the embed if the stars were reacted. Delete star embed if the star count is below threshold.
+        """
+        if payload.emoji.name not in STARS or payload.channel_id in self.blacklist:
+            return
+
+        channel = self.bot.get_channel(payload.channel_id)
+        if not channel:
+            return
+
+        async with self.locks(payload.message_id):
+            star_count = await self.update_star_count(channel, payload)
 
-        db.close()
+            if await self.get_star_embed_id(payload.channel_id, payload.message_id):
+                message = await self.get_message(channel, payload.message_id)
+                self.schedule_edit(message, star_count)
 
 
 def setup(bot: commands.bot.Bot) -> None:
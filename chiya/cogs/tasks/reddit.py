@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import time
 
@@ -5,24 +6,44 @@ import asyncpraw
 import discord
 from discord.ext import commands, tasks
 
-from chiya import config
+from chiya import config, database
+from chiya.utils.cache import TTLCache
 
 
 log = logging.getLogger(__name__)
 
+# Submissions older than this are never posted, so they only need to be remembered for this long.
+SEEN_TTL = 7 * 24 * 60 * 60
+SEEN_MAX_SIZE = 1000
+# How long subreddit metadata and author profiles are reused before being fetched again.
+SUBREDDIT_TTL = 60 * 60
+AUTHOR_TTL = 6 * 60 * 60
+AUTHOR_MAX_SIZE = 500
+# The most submissions posted when catching up after downtime, and the pause before restarting a broken stream.
+BACKFILL_LIMIT = 100
+STREAM_RETRY = 30
+
 
 class RedditTasks(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
-        self.bot_started_at = time.time()
-        self.cache = []
+        self.seen = None
+        self.cursor = None
+        self.authors = TTLCache(maxsize=AUTHOR_MAX_SIZE, ttl=AUTHOR_TTL)
+        self.subreddit_info = {}
+        self.subreddit_loaded_at = None
+        self.channels = {}
         self.client_id = config.get("reddit", {}).get("client_id")
         self.client_secret = config.get("reddit", {}).get("client_secret")
         self.user_agent = config.get("reddit", {}).get("user_agent")
-        self.subreddit = config.get("reddit", {}).get("subreddit")
-        self.channel = config.get("reddit", {}).get("channel")
+        self.mode = config.get("reddit", {}).get("mode", "poll")
+        self.feeds = self.load_feeds()
+
+        # Every feed is fetched through one combined listing, e.g. /r/snackbox+animepiracy/new.
+        self.subreddits = list(dict.fromkeys(feed["subreddit"] for feed in self.feeds))
+        self.listing_limit = min(10 * len(self.subreddits), 100)
 
-        if not all([self.client_id, self.client_secret, self.user_agent, self.subreddit, self.channel]):
+        if not all([self.client_id, self.client_secret, self.user_agent, self.feeds]):
             log.warning("Reddit functionality is disabled due to missing prerequisites")
             return
 
@@ -30,11 +51,187 @@ class RedditTasks(commands.Cog):
             client_id=self.client_id, client_secret=self.client_secret, user_agent=self.user_agent
         )
 
-        log.info("Starting reddit functionality background task")
-        self.check_for_posts.start()
+        log.info(f"Starting reddit functionality background task in {self.mode} mode")
+        if self.mode == "stream":
+            self.stream_posts.start()
+        else:
+            self.check_for_posts.start()
 
     def cog_unload(self) -> None:
         self.check_for_posts.cancel()
+        self.stream_posts.cancel()
+
+    def load_feeds(self) -> list[dict]:
+        """
+        Reads the subreddit to channel routing table from config.
+
+        Each entry in `reddit.feeds` takes a subreddit, a channel, and optionally a list of flairs
+        to restrict it to. The single `reddit.subreddit` and `reddit.channel` keys are still
+        supported as a feed without a flair filter.
+        """
+        feeds = config.get("reddit", {}).get("feeds") or []
+        if not feeds and config.get("reddit", {}).get("subreddit") and config.get("reddit", {}).get("channel"):
+            feeds = [dict(subreddit=config["reddit"]["subreddit"], channel=config["reddit"]["channel"])]
+
+        return [
+            dict(
+                subreddit=feed["subreddit"].lower(),
+                channel=feed["channel"],
+                flairs={flair.lower() for flair in feed["flairs"]} if feed.get("flairs") else None,
+            )
+            for feed in feeds
+            if feed.get("subreddit") and feed.get("channel")
+        ]
+
+    def get_routes(self, submission: asyncpraw.models.Submission) -> list[int]:
+        """
+        Returns the IDs of the channels that a submission should be posted to.
+        """
+        subreddit = str(submission.subreddit).lower()
+        flair = (submission.link_flair_text or "").lower()
+        return list(
+            dict.fromkeys(
+                feed["channel"]
+                for feed in self.feeds
+                if feed["subreddit"] == subreddit and (not feed["flairs"] or flair in feed["flairs"])
+            )
+        )
+
+    async def load_seen(self, subreddit: asyncpraw.models.Subreddit) -> None:
+        """
+        Loads the recently posted submissions from the database, including any posted before a restart.
+
+        On the very first run there is nothing to resume from, so the current listing is
+        marked as seen instead of flooding the channel with old submissions.
+        """
+        cutoff = int(time.time()) - SEEN_TTL
+        async with database.session() as db:
+            await db["reddit_posts"].delete(posted_at={"<": cutoff})
+            results = await db["reddit_posts"].find(order_by="posted_at")
+            cursor = await db["bot_state"].find_one(name="reddit_cursor")
+
+        self.seen = TTLCache(maxsize=SEEN_MAX_SIZE, ttl=SEEN_TTL)
+        for result in results:
+            self.seen.set(result["submission_id"], created_at=result["posted_at"])
+        self.cursor = cursor["value"] if cursor else None
+
+        if not results:
+            for submission in reversed([submission async for submission in subreddit.new(limit=self.listing_limit)]):
+                await self.mark_seen(submission)
+
+        log.info(f"Loaded {len(self.seen)} previously posted reddit submissions")
+
+    async def mark_seen(self, submission: asyncpraw.models.Submission) -> None:
+        """
+        Remembers a submission in memory and in the database so that it is never posted twice,
+        and moves the cursor that streaming resumes from up to it.
+        """
+        self.seen.set(submission.id)
+        self.cursor = submission.fullname
+        async with database.session() as db:
+            await db["reddit_posts"].insert(dict(submission_id=submission.id, posted_at=int(time.time())))
+            await db["bot_state"].upsert(dict(name="reddit_cursor", value=submission.fullname), ["name"])
+
+    def is_new(self, submission: asyncpraw.models.Submission) -> bool:
+        """
+        Checks whether a submission has not been posted yet and is recent enough to post.
+        """
+        return submission.id not in self.seen and submission.created_utc > time.time() - SEEN_TTL
+
+    async def get_subreddit(self) -> asyncpraw.models.Subreddit:
+        """
+        Returns the combined subreddit of every feed, refetching their metadata once SUBREDDIT_TTL has passed.
+        """
+        if not self.subreddit_loaded_at or time.time() - self.subreddit_loaded_at > SUBREDDIT_TTL:
+            for name in self.subreddits:
+                self.subreddit_info[name] = await self.reddit.subreddit(name, fetch=True)
+            self.subreddit_loaded_at = time.time()
+        return await self.reddit.subreddit("+".join(self.subreddits))
+
+    async def load_authors(self, submissions: list[asyncpraw.models.Submission]) -> None:
+        """
+        Fetches the profiles of every author not already cached in a single request.
+        """
+        fullnames = {
+            submission.author_fullname
+            for submission in submissions
+            if getattr(submission, "author_fullname", None) and submission.author_fullname not in self.authors
+        }
+        if not fullnames:
+            return
+
+        async for author in self.reddit.redditors.partial_redditors(fullnames):
+            self.authors.set(author.fullname, author)
+
+    def make_embed(self, submission: asyncpraw.models.Submission) -> discord.Embed:
+        """
+        Builds the embed posted for a submission from the cached author and subreddit metadata.
+        """
+        embed = discord.Embed(
+            title=submission.title[0:252],
+            url=f"https://reddit.com{submission.permalink}",
+            description=submission.selftext[0:350],  # Cuts off the description.
+        )
+
+        author = self.authors.get(getattr(submission, "author_fullname", None))
+        name = author.name if author else str(submission.author or "[deleted]")
+        embed.set_author(
+            name=name,
+            url=f"https://reddit.com/u/{name}",
+            icon_url=author.profile_img if author else discord.Embed.Empty,
+        )
+
+        subreddit = self.subreddit_info.get(str(submission.subreddit).lower())
+        embed.set_footer(
+            text=f"{submission.link_flair_text} posted on /r/{submission.subreddit}",
+            icon_url=subreddit.community_icon if subreddit else discord.Embed.Empty,
+        )
+
+        # Adds ellipsis if the data is too long to signify cutoff.
+        if len(submission.title) >= 252:
+            embed.title = embed.title + "..."
+
+        if len(submission.selftext) >= 350:
+            embed.description = embed.description + "..."
+
+        return embed
+
+    async def post_submissions(self, submissions: list[asyncpraw.models.Submission]) -> None:
+        """
+        Posts the submissions, oldest first, to every channel whose feed they match. Submissions
+        that match no feed are still marked as seen so that they aren't checked again.
+        """
+        await self.load_authors(submissions)
+
+        for submission in sorted(submissions, key=lambda submission: submission.created_utc):
+            routes = self.get_routes(submission)
+            if routes:
+                log.info(f"{submission.title} was posted by /u/{submission.author}")
+                embed = self.make_embed(submission)
+
+            for channel_id in routes:
+                if channel_id not in self.channels:
+                    self.channels[channel_id] = await self.bot.fetch_channel(channel_id)
+                await self.channels[channel_id].send(embed=embed)
+
+            await self.mark_seen(submission)
+
+    async def backfill(self, subreddit: asyncpraw.models.Subreddit) -> None:
+        """
+        Posts the submissions made since the cursor, i.e. while the bot was offline or the stream was down.
+
+        Reddit returns nothing after a cursor whose submission has since been removed or deleted, so
+        in that case the latest submissions are checked instead.
+        """
+        params = {"before": self.cursor} if self.cursor else None
+        listing = [submission async for submission in subreddit.new(limit=BACKFILL_LIMIT, params=params)]
+        if not listing and params:
+            listing = [submission async for submission in subreddit.new(limit=BACKFILL_LIMIT)]
+
+        submissions = [submission for submission in listing if self.is_new(submission)]
+        if submissions:
+            log.info(f"Backfilling {len(submissions)} reddit submissions")
+            await self.post_submissions(submissions)
 
     @tasks.loop(seconds=5)
     async def check_for_posts(self) -> None:
@@ -45,48 +242,46 @@ class RedditTasks(commands.Cog):
         await self.bot.wait_until_ready()
 
         try:
-            subreddit = await self.reddit.subreddit(config["reddit"]["subreddit"])
-            async for submission in subreddit.new(limit=10):
-                if submission.id in self.cache or submission.created_utc <= self.bot_started_at:
-                    continue
-
-                await submission.author.load()
-                await submission.subreddit.load()
-
-                embed = discord.Embed(
-                    title=submission.title[0:252],
-                    url=f"https://reddit.com{submission.permalink}",
-                    description=submission.selftext[0:350],  # Cuts off the description.
-                )
+            subreddit = await self.get_subreddit()
+            if self.seen is None:
+                await self.load_seen(subreddit)
 
-                embed.set_author(
-                    name=submission.author.name,
-                    url=f"https://reddit.com/u/{submission.author.name}",
-                    icon_url=submission.author.icon_img,
-                )
+            submissions = [
+                submission async for submission in subreddit.new(limit=self.listing_limit) if self.is_new(submission)
+            ]
+            if submissions:
+                await self.post_submissions(submissions)
 
-                embed.set_footer(
-                    text=f"{submission.link_flair_text} posted on /r/{submission.subreddit}",
-                    icon_url=submission.subreddit.community_icon,
-                )
+        # Catch all to avoid crashing when reddit has issues.
+        except Exception as e:
+            log.error(e)
 
-                # Adds ellipsis if the data is too long to signify cutoff.
-                if len(submission.title) >= 252:
-                    embed.title = embed.title + "..."
+    @tasks.loop()
+    async def stream_posts(self) -> None:
+        """
+        Posts new reddit submissions as soon as the submission stream yields them, after
+        backfilling anything missed since the cursor. Restarts after a short pause on errors.
 
-                if len(submission.selftext) >= 350:
-                    embed.description = embed.description + "..."
+        The stream starts with the latest submissions rather than skipping them, so that anything
+        posted between the backfill and the stream's first request isn't lost, and the ones that
+        were already posted are skipped as seen.
+        """
+        await self.bot.wait_until_ready()
 
-                if not isinstance(self.channel, discord.TextChannel):
-                    self.channel = await self.bot.fetch_channel(self.channel)
+        try:
+            subreddit = await self.get_subreddit()
+            if self.seen is None:
+                await self.load_seen(subreddit)
 
-                log.info(f"{submission.title} was posted by /u/{submission.author.name}")
-                await self.channel.send(embed=embed)
-                self.cache.append(submission.id)
+            await self.backfill(subreddit)
+            async for submission in subreddit.stream.submissions(skip_existing=False):
+                if self.is_new(submission):
+                    await self.post_submissions([submission])
 
         # Catch all to avoid crashing when reddit has issues.
         except Exception as e:
-            log.error(e)
+            log.error(f"Reddit stream stopped, restarting in {STREAM_RETRY} seconds: {e}")
+            await asyncio.sleep(STREAM_RETRY)
 
 
 def setup(bot: commands.Bot) -> None:
@@ -1,8 +1,12 @@
+import asyncio
+import heapq
 import logging
-from datetime import datetime, timezone
+import time
+from collections import defaultdict
 
 import discord
 from discord.ext import commands, tasks
+from sqlalchemy import bindparam, text
 
 from chiya import database
 from chiya.utils import embeds
@@ -10,51 +14,221 @@ from chiya.utils import embeds
 
 log = logging.getLogger(__name__)
 
+# The number of channels that due reminders are sent to at the same time.
+MAX_CONCURRENT_CHANNELS = 10
+
 
 class ReminderTasks(commands.Cog):
     def __init__(self, bot: commands.Bot) -> None:
         self.bot = bot
+        # Min-heap of (date_to_remind, id). Entries whose reminder was edited, deleted, or sent since they
+        # were pushed no longer match `self.reminders` and are discarded when they reach the top.
+        self.heap = None
+        self.reminders = {}
+        self.sending = set()
+        # The reminders scheduled (or None for removed) since each load in progress started, which its query
+        # may or may not have seen.
+        self.loads = []
+        self.wakeup = asyncio.Event()
         self.check_for_reminder.start()
 
     def cog_unload(self) -> None:
         self.check_for_reminder.cancel()
 
-    @tasks.loop(seconds=3.0)
+    async def load_reminders(self) -> None:
+        """
+        Replaces the in-memory schedule with the unsent reminders stored in the database, keeping the
+        changes made to the schedule while the query was running.
+        """
+        changes = {}
+        # Reminders that finish sending while the query runs may still be unsent in its results.
+        sending = set(self.sending)
+        self.loads.append(changes)
+        try:
+            async with database.session() as db:
+                results = await db["remind_me"].find(sent=False)
+        finally:
+            self.loads.remove(changes)
+
+        sending.update(self.sending)
+        reminders = {reminder["id"]: reminder for reminder in results if reminder["id"] not in sending}
+        for reminder_id, reminder in changes.items():
+            if reminder:
+                reminders[reminder_id] = reminder
+            else:
+                reminders.pop(reminder_id, None)
+
+        self.reminders = reminders
+        self.heap = [(reminder["date_to_remind"], reminder["id"]) for reminder in self.reminders.values()]
+        heapq.heapify(self.heap)
+        self.wakeup.set()
+        log.info(f"Loaded {len(self.reminders)} pending reminders")
+
+    def schedule(self, reminder: dict) -> None:
+        """
+        Adds or replaces a reminder in the schedule, waking the task up if it is now the next one due.
+
+        Reminders that are being sent are left alone, they are still unsent in the database until
+        the delivery finishes and would otherwise be scheduled and sent a second time.
+        """
+        if reminder["id"] in self.sending:
+            return
+
+        previous = self.reminders.get(reminder["id"])
+        self.reminders[reminder["id"]] = reminder
+        self.record(reminder["id"], reminder)
+        if self.heap is None or (previous and previous["date_to_remind"] == reminder["date_to_remind"]):
+            return
+
+        heapq.heappush(self.heap, (reminder["date_to_remind"], reminder["id"]))
+        if self.heap[0][1] == reminder["id"]:
+            self.wakeup.set()
+
+    def unschedule(self, reminder_id: int) -> dict | None:
+        """
+        Removes a reminder from the schedule because it was deleted or is due, and returns it.
+        """
+        self.record(reminder_id, None)
+        return self.reminders.pop(reminder_id, None)
+
+    def record(self, reminder_id: int, reminder: dict | None) -> None:
+        for changes in self.loads:
+            changes[reminder_id] = reminder
+
+    def is_current(self, entry: tuple) -> bool:
+        """
+        Checks whether a heap entry still refers to a pending reminder at the same time.
+        """
+        date_to_remind, reminder_id = entry
+        reminder = self.reminders.get(reminder_id)
+        return bool(reminder) and reminder["date_to_remind"] == date_to_remind
+
+    @commands.Cog.listener()
+    async def on_reminder_create(self, reminder: dict) -> None:
+        self.schedule(reminder)
+
+    @commands.Cog.listener()
+    async def on_reminder_edit(self, reminder: dict) -> None:
+        self.schedule(reminder)
+
+    @commands.Cog.listener()
+    async def on_reminder_delete(self, reminder_id: int) -> None:
+        self.unschedule(reminder_id)
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        """
+        Reconciles the schedule with the database after reconnecting, the first load is done by the task.
+        """
+        if self.heap is not None:
+            await self.load_reminders()
+
+    @commands.Cog.listener()
+    async def on_resumed(self) -> None:
+        await self.load_reminders()
+
+    @tasks.loop()
     async def check_for_reminder(self) -> None:
         """
-        Checking for reminders to send
+        Sleeps until the next reminder is due, or until an earlier one is scheduled, and sends it.
         """
         await self.bot.wait_until_ready()
 
-        db = database.Database().get()
-        result = db["remind_me"].find(sent=False, date_to_remind={"<": datetime.now(tz=timezone.utc).timestamp()})
+        if self.heap is None:
+            try:
+                await self.load_reminders()
+            except Exception as e:
+                log.error(f"Unable to load reminders, retrying in 30 seconds: {e}")
+                return await asyncio.sleep(30)
+
+        while self.heap and not self.is_current(self.heap[0]):
+            heapq.heappop(self.heap)
+
+        self.wakeup.clear()
+        timeout = self.heap[0][0] - time.time() if self.heap else None
+        if timeout is None or timeout > 0:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        due = []
+        while self.heap and self.heap[0][0] <= time.time():
+            entry = heapq.heappop(self.heap)
+            if self.is_current(entry):
+                due.append(self.unschedule(entry[1]))
+
+        await self.send_reminders(due)
+
+    async def send_reminders(self, reminders: list[dict]) -> None:
+        """
+        Sends due reminders concurrently and marks them as sent in a single query.
+
+        Messages sent to the same channel share a Discord rate limit bucket, so each channel's
+        reminders are sent in order by one worker while up to MAX_CONCURRENT_CHANNELS channels
+        are served at once. The HTTP client handles any 429s within a bucket.
+        """
+        by_channel = defaultdict(list)
+        for reminder in reminders:
+            by_channel[reminder["reminder_location"]].append(reminder)
+            self.sending.add(reminder["id"])
+
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_CHANNELS)
+
+        async def worker(channel_reminders: list[dict]) -> None:
+            async with semaphore:
+                for reminder in channel_reminders:
+                    try:
+                        await self.send_reminder(reminder)
+                    except Exception as e:
+                        log.error(f"Unable to send reminder {reminder['id']}: {e}")
+
+        try:
+            await asyncio.gather(*(worker(channel_reminders) for channel_reminders in by_channel.values()))
+            await self.mark_sent([reminder["id"] for reminder in reminders])
+        except Exception as e:
+            log.error(f"Unable to mark {len(reminders)} reminders as sent: {e}")
+        finally:
+            self.sending.difference_update(reminder["id"] for reminder in reminders)
+
+    async def mark_sent(self, reminder_ids: list[int]) -> None:
+        """
+        Marks the reminders as sent with one `UPDATE ... WHERE id IN (...)` per thousand IDs.
+        """
+        statement = text("UPDATE remind_me SET sent = TRUE WHERE id IN :ids").bindparams(
+            bindparam("ids", expanding=True)
+        )
+        async with database.session() as db:
+            for i in range(0, len(reminder_ids), 1000):
+                await db.execute(statement, ids=reminder_ids[i : i + 1000])
+
+    async def get_user(self, user_id: int) -> discord.User:
+        """
+        Resolves the user from the member cache before falling back to the API.
+        """
+        return self.bot.get_user(user_id) or await self.bot.fetch_user(user_id)
+
+    async def send_reminder(self, reminder: dict) -> None:
+        """
+        Posts the reminder in its original channel, falling back to DMs.
+        """
+        channel = self.bot.get_channel(reminder["reminder_location"])
+        try:
+            user = await self.get_user(reminder["author_id"])
+        except discord.HTTPException:
+            log.warning(f"Reminder entry with ID {reminder['id']} has an invalid user ID: {reminder['author_id']}.")
+            return
 
-        if not result:
-            return db.close()
+        embed = embeds.make_embed(title="Here is your reminder", description=reminder["message"], color="blurple")
 
-        for reminder in result:
-            channel = self.bot.get_channel(reminder["reminder_location"])
+        if channel:
             try:
-                user = await self.bot.fetch_user(reminder["author_id"])
-            except Exception:  # TODO: Add a proper Exception here
-                db["remind_me"].update(dict(id=reminder["id"], sent=True), ["id"])
-                log.warning(f"Reminder entry with ID {reminder['id']} has an invalid user ID: {reminder['author_id']}.")
-                continue
-
-            embed = embeds.make_embed(title="Here is your reminder", description=reminder["message"], color="blurple")
-
-            if channel:
-                try:
-                    await channel.send(user.mention, embed=embed)
-                except discord.HTTPException:
-                    dm = await user.create_dm()
-                    if not await dm.send(embed=embed):
-                        log.warning(f"Unable to post or DM {user}'s reminder {reminder['id']=}.")
-
-            db["remind_me"].update(dict(id=reminder["id"], sent=True), ["id"])
-
-        db.commit()
-        db.close()
+                await channel.send(user.mention, embed=embed)
+            except discord.HTTPException:
+                dm = await user.create_dm()
+                if not await dm.send(embed=embed):
+                    log.warning(f"Unable to post or DM {user}'s reminder {reminder['id']=}.")
 
 
 def setup(bot: commands.Bot) -> None:
@@ -1,7 +1,14 @@
+import asyncio
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
 
 import dataset
-from sqlalchemy import create_engine
+from sqlalchemy import Index, LargeBinary, String, create_engine
+from sqlalchemy.dialects import mysql
 from sqlalchemy_utils import database_exists, create_database
 
 from config import config
@@ -10,82 +17,408 @@ from config import config
 log = logging.getLogger(__name__)
 
 
+class AsyncTable:
+    """
+    A dataset table whose queries are run on the database executor.
+
+    Mirrors the subset of `dataset.Table` used by the cogs, except that every
+    method returns an awaitable and `find` returns a list instead of a lazy
+    iterator so that no cursor outlives the worker thread that opened it.
+    """
+
+    def __init__(self, database: "Database", name: str) -> None:
+        self.database = database
+        self.name = name
+
+    async def insert(self, row: dict, *args, **kwargs) -> Any:
+        return await self.database.run(lambda db: db[self.name].insert(row, *args, **kwargs))
+
+    async def update(self, row: dict, keys: list, *args, **kwargs) -> Any:
+        return await self.database.run(lambda db: db[self.name].update(row, keys, *args, **kwargs))
+
+    async def upsert(self, row: dict, keys: list, *args, **kwargs) -> Any:
+        return await self.database.run(lambda db: db[self.name].upsert(row, keys, *args, **kwargs))
+
+    async def insert_many(self, rows: list[dict]) -> None:
+        # dataset's own insert_many executes on the connection its metadata is bound to, which belongs to whichever
+        # thread created the table, so the rows are inserted with one executemany on this thread's connection instead.
+        if rows:
+            await self.database.run(lambda db: db.executable.execute(db[self.name].table.insert(), rows))
+
+    async def delete(self, *clauses, **filters) -> bool:
+        return await self.database.run(lambda db: db[self.name].delete(*clauses, **filters))
+
+    async def find(self, *clauses, **kwargs) -> list[dict]:
+        return await self.database.run(lambda db: list(db[self.name].find(*clauses, **kwargs)))
+
+    async def find_one(self, *clauses, **kwargs) -> dict | None:
+        return await self.database.run(lambda db: db[self.name].find_one(*clauses, **kwargs))
+
+    async def count(self, *clauses, **kwargs) -> int:
+        return await self.database.run(lambda db: db[self.name].count(*clauses, **kwargs))
+
+
+class AsyncDatabase:
+    """
+    The object yielded by `database.session()`, e.g. `await db["mod_logs"].insert(...)`.
+    """
+
+    def __init__(self, database: "Database") -> None:
+        self.database = database
+
+    def __getitem__(self, name: str) -> AsyncTable:
+        return AsyncTable(self.database, name)
+
+    async def query(self, statement, **params) -> list[dict]:
+        """
+        Runs a raw statement and returns all of its rows.
+        """
+        return await self.database.run(lambda db: list(db.query(statement, **params)))
+
+    async def execute(self, statement, **params) -> int:
+        """
+        Runs a raw statement that does not return rows and returns the number of affected rows.
+        """
+        return await self.database.run(lambda db: db.executable.execute(statement, params).rowcount)
+
+
 class Database:
     def __init__(self) -> None:
         self.host = config["database"]["host"]
         self.database = config["database"]["database"]
         self.user = config["database"]["user"]
         self.password = config["database"]["password"]
+        self.pool_size = config["database"].get("pool_size", 5)
 
         if not all([self.host, self.database, self.user, self.password]):
             log.error("One or more database connection variables are missing, exiting...")
             raise SystemExit
 
         self.url = f"mysql://{self.user}:{self.password}@{self.host}/{self.database}"
-        self.setup()
+        self.db = None
+
+        # Every query runs on one of these threads, each holding at most one pooled connection.
+        self.executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="database")
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.saturated_since = None
+        self.metrics_lock = threading.Lock()
+        self.setup_lock = threading.Lock()
 
     def get(self) -> dataset.Database:
         """
-        Returns the dataset database object.
+        Returns the shared dataset database object, setting it up on first use.
+        """
+        if not self.db:
+            self.setup()
+        return self.db
+
+    def release(self) -> None:
+        """
+        Returns the calling thread's connection to the pool so that it is
+        health checked on the next checkout instead of idling forever.
+        """
+        with self.db.lock:
+            connection = self.db.connections.pop(threading.get_ident(), None)
+        if connection:
+            connection.close()
+
+    @property
+    def queue_depth(self) -> int:
+        """
+        The number of queries waiting for a free worker thread.
+        """
+        return max(0, self.in_flight - self.pool_size)
+
+    def stats(self) -> dict:
+        """
+        Returns a snapshot of the executor metrics.
+        """
+        with self.metrics_lock:
+            completed, total_wait = self.completed, self.total_wait
+        return dict(
+            pool_size=self.pool_size,
+            in_flight=self.in_flight,
+            queue_depth=self.queue_depth,
+            peak_queue_depth=self.peak_queue_depth,
+            completed=completed,
+            average_wait_ms=round(total_wait / completed * 1000, 2) if completed else 0.0,
+        )
+
+    def execute(self, func: Callable[[dataset.Database], Any], submitted_at: float) -> Any:
+        """
+        Runs on a worker thread: executes the query and hands the connection back to the pool.
+        """
+        waited = time.perf_counter() - submitted_at
+        with self.metrics_lock:
+            self.completed += 1
+            self.total_wait += waited
+
+        try:
+            return func(self.get())
+        finally:
+            self.release()
+
+    async def run(self, func: Callable[[dataset.Database], Any]) -> Any:
+        """
+        Runs `func(db)` on the database executor without blocking the event loop.
         """
-        return dataset.connect(url=self.url)
+        self.in_flight += 1
+        depth = self.queue_depth
+        self.peak_queue_depth = max(self.peak_queue_depth, depth)
+        if depth and not self.saturated_since:
+            self.saturated_since = time.monotonic()
+            log.warning(f"Database pool saturated, {depth} queries waiting for a connection: {self.stats()}")
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self.execute, func, time.perf_counter())
+        finally:
+            self.in_flight -= 1
+            if self.saturated_since and not self.queue_depth:
+                log.info(
+                    f"Database pool recovered after {time.monotonic() - self.saturated_since:.2f}s: {self.stats()}"
+                )
+                self.saturated_since = None
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[AsyncDatabase]:
+        """
+        Yields an AsyncDatabase whose queries run on the database executor.
+        """
+        if not self.db:
+            await asyncio.get_running_loop().run_in_executor(self.executor, self.setup)
+
+        yield AsyncDatabase(self)
 
     def setup(self) -> None:
         """
-        Sets up the tables needed for Chiya.
+        Creates the long-lived connection pool and migrates the schema to the latest version.
+        """
+        with self.setup_lock:
+            if not self.db:
+                self.connect()
+
+    def connect(self) -> None:
+        """
+        Creates the database if it does not exist yet and opens the connection pool.
         """
         engine = create_engine(self.url)
         if not database_exists(engine.url):
             create_database(engine.url)
+        engine.dispose()
+
+        db = dataset.connect(
+            url=self.url,
+            engine_kwargs=dict(
+                pool_size=self.pool_size,
+                max_overflow=0,
+                pool_recycle=3600,
+                pool_pre_ping=True,
+            ),
+        )
+
+        self.migrate(db)
+        self.db = db
+        self.release()
+
+    def migrate(self, db: dataset.Database) -> None:
+        """
+        Applies every migration in MIGRATIONS newer than the version recorded in `schema_migrations`.
+        """
+        if "schema_migrations" not in db:
+            schema_migrations = db.create_table("schema_migrations")
+            schema_migrations.create_column("version", db.types.integer)
+            schema_migrations.create_column("name", db.types.text)
+            schema_migrations.create_column("applied_at", db.types.bigint)
+
+            # Databases created before migrations were versioned already have the initial tables.
+            if "mod_logs" in db:
+                schema_migrations.insert(dict(version=1, name=MIGRATIONS[0].__name__, applied_at=int(time.time())))
+
+        applied = {row["version"] for row in db["schema_migrations"].all()}
+        for version, migration in enumerate(MIGRATIONS, start=1):
+            if version in applied:
+                continue
+
+            log.info(f"Applying database migration {version}: {migration.__name__}")
+            migration(db)
+            db["schema_migrations"].insert(dict(version=version, name=migration.__name__, applied_at=int(time.time())))
+
+
+def binary_string(length: int) -> String:
+    """
+    A string column that compares byte for byte on MySQL and MariaDB.
+
+    Their default collation treats case and accents as equal and gives every character outside
+    the Basic Multilingual Plane (most emoji) the same weight, so distinct values would collide
+    in a unique index.
+    """
+    binary = mysql.VARCHAR(length, charset="utf8mb4", collation="utf8mb4_bin")
+    return String(length).with_variant(binary, "mysql").with_variant(binary, "mariadb")
+
+
+def create_unique_index(db: dataset.Database, table_name: str, columns: list[str], name: str) -> None:
+    """
+    Creates a unique index over the full length of its columns.
+
+    `dataset.Table.create_index` only indexes the first 10 characters of string columns on MySQL,
+    so distinct values that share those characters would collide in a unique index made with it.
+    """
+    table = db[table_name].table
+    Index(name, *(table.c[column] for column in columns), unique=True).create(db.executable)
+
+
+def create_initial_tables(db: dataset.Database) -> None:
+    """
+    Creates the tables needed for Chiya.
+    """
+    mod_logs = db.create_table("mod_logs")
+    mod_logs.create_column("user_id", db.types.bigint)
+    mod_logs.create_column("mod_id", db.types.bigint)
+    mod_logs.create_column("timestamp", db.types.bigint)
+    mod_logs.create_column("reason", db.types.text)
+    mod_logs.create_column("duration", db.types.text)
+    mod_logs.create_column("type", db.types.text)
+
+    remind_me = db.create_table("remind_me")
+    remind_me.create_column("reminder_location", db.types.bigint)
+    remind_me.create_column("author_id", db.types.bigint)
+    remind_me.create_column("date_to_remind", db.types.bigint)
+    remind_me.create_column("message", db.types.text)
+    remind_me.create_column("sent", db.types.boolean, default=False)
+
+    timed_mod_actions = db.create_table("timed_mod_actions")
+    timed_mod_actions.create_column("user_id", db.types.bigint)
+    timed_mod_actions.create_column("mod_id", db.types.bigint)
+    timed_mod_actions.create_column("action_type", db.types.text)
+    timed_mod_actions.create_column("start_time", db.types.bigint)
+    timed_mod_actions.create_column("end_time", db.types.bigint)
+    timed_mod_actions.create_column("is_done", db.types.boolean, default=False)
+    timed_mod_actions.create_column("reason", db.types.text)
+
+    tickets = db.create_table("tickets")
+    tickets.create_column("user_id", db.types.bigint)
+    tickets.create_column("guild", db.types.bigint)
+    tickets.create_column("timestamp", db.types.bigint)
+    tickets.create_column("ticket_subject", db.types.text)
+    tickets.create_column("ticket_message", db.types.text)
+    tickets.create_column("log_url", db.types.text)
+    tickets.create_column("status", db.types.boolean)
+
+    starboard = db.create_table("starboard")
+    starboard.create_column("channel_id", db.types.bigint)
+    starboard.create_column("message_id", db.types.bigint)
+    starboard.create_column("star_embed_id", db.types.bigint)
+
+
+def add_lookup_indexes(db: dataset.Database) -> None:
+    """
+    Indexes the columns that /search, the reminder commands, ticket closing, and the starboard filter on.
+    """
+    db["mod_logs"].create_index(["user_id", "type"], name="ix_mod_logs_user_id_type")
+    db["remind_me"].create_index(["sent", "date_to_remind"], name="ix_remind_me_sent_date_to_remind")
+    db["remind_me"].create_index(["author_id", "sent"], name="ix_remind_me_author_id_sent")
+    db["tickets"].create_index(["user_id", "status"], name="ix_tickets_user_id_status")
+
+    # Keep the oldest entry of any duplicated starboard posts so that the unique index can be created.
+    db.query(
+        "DELETE newer FROM starboard newer JOIN starboard older "
+        "ON newer.channel_id = older.channel_id AND newer.message_id = older.message_id AND newer.id > older.id"
+    )
+    db["starboard"].create_index(["channel_id", "message_id"], name="ux_starboard_channel_id_message_id", unique=True)
+
+
+def create_reddit_posts(db: dataset.Database) -> None:
+    """
+    Creates the table of submissions already posted by the Reddit feed, so that restarts don't repost or skip them.
+    """
+    reddit_posts = db.create_table("reddit_posts")
+    reddit_posts.create_column("submission_id", db.types.string(16))
+    reddit_posts.create_column("posted_at", db.types.bigint)
+    reddit_posts.create_index(["submission_id"], name="ux_reddit_posts_submission_id", unique=True)
+    reddit_posts.create_index(["posted_at"], name="ix_reddit_posts_posted_at")
+
+
+def create_bot_state(db: dataset.Database) -> None:
+    """
+    Creates a key/value table for small pieces of state that have to survive restarts, like the Reddit feed cursor.
+    """
+    bot_state = db.create_table("bot_state")
+    bot_state.create_column("name", binary_string(64))
+    bot_state.create_column("value", db.types.text)
+    create_unique_index(db, "bot_state", ["name"], "ux_bot_state_name")
+
+
+def create_starboard_stars(db: dataset.Database) -> None:
+    """
+    Creates the table of star reactions on each message, so that star counts survive restarts without a recount.
+    """
+    starboard_stars = db.create_table("starboard_stars")
+    starboard_stars.create_column("channel_id", db.types.bigint)
+    starboard_stars.create_column("message_id", db.types.bigint)
+    starboard_stars.create_column("user_id", db.types.bigint)
+    starboard_stars.create_column("emoji", binary_string(16))
+    create_unique_index(
+        db, "starboard_stars", ["message_id", "user_id", "emoji"], "ux_starboard_stars_message_id_user_id_emoji"
+    )
+
+
+def create_ticket_transcripts(db: dataset.Database) -> None:
+    """
+    Creates the archive of compressed ticket transcripts and the index of the words in them, so that closed
+    tickets can be searched and read without PrivateBin.
+    """
+    ticket_transcripts = db.create_table("ticket_transcripts")
+    ticket_transcripts.create_column("ticket_id", db.types.bigint)
+    ticket_transcripts.create_column("user_id", db.types.bigint)
+    ticket_transcripts.create_column("channel_name", db.types.string(100))
+    ticket_transcripts.create_column("closed_at", db.types.bigint)
+    # LONGBLOB on MySQL and MariaDB, a plain BLOB tops out at 64 KiB.
+    ticket_transcripts.create_column("transcript", LargeBinary(length=2**32 - 1))
+    ticket_transcripts.create_index(["ticket_id"], name="ux_ticket_transcripts_ticket_id", unique=True)
+
+    ticket_terms = db.create_table("ticket_terms")
+    ticket_terms.create_column("term", binary_string(64))
+    ticket_terms.create_column("ticket_id", db.types.bigint)
+    create_unique_index(db, "ticket_terms", ["term", "ticket_id"], "ux_ticket_terms_term_ticket_id")
+
+
+# Append new migrations to the end, never reorder or remove them: the position is the schema version.
+MIGRATIONS = [
+    create_initial_tables,
+    add_lookup_indexes,
+    create_reddit_posts,
+    create_bot_state,
+    create_starboard_stars,
+    create_ticket_transcripts,
+]
+
+
+_database = None
+
+
+def get_database() -> Database:
+    """
+    Returns the process-wide Database instance.
+    """
+    global _database
+    if not _database:
+        _database = Database()
+    return _database
+
+
+def setup() -> None:
+    """
+    Creates the process-wide connection pool and tables at startup.
+    """
+    get_database().setup()
+
 
-        db = self.get()
-
-        if "mod_logs" not in db:
-            mod_logs = db.create_table("mod_logs")
-            mod_logs.create_column("user_id", db.types.bigint)
-            mod_logs.create_column("mod_id", db.types.bigint)
-            mod_logs.create_column("timestamp", db.types.bigint)
-            mod_logs.create_column("reason", db.types.text)
-            mod_logs.create_column("duration", db.types.text)
-            mod_logs.create_column("type", db.types.text)
-            log.info("Created missing table: mod_logs")
-
-        if "remind_me" not in db:
-            remind_me = db.create_table("remind_me")
-            remind_me.create_column("reminder_location", db.types.bigint)
-            remind_me.create_column("author_id", db.types.bigint)
-            remind_me.create_column("date_to_remind", db.types.bigint)
-            remind_me.create_column("message", db.types.text)
-            remind_me.create_column("sent", db.types.boolean, default=False)
-            log.info("Created missing table: remind_me")
-
-        if "timed_mod_actions" not in db:
-            timed_mod_actions = db.create_table("timed_mod_actions")
-            timed_mod_actions.create_column("user_id", db.types.bigint)
-            timed_mod_actions.create_column("mod_id", db.types.bigint)
-            timed_mod_actions.create_column("action_type", db.types.text)
-            timed_mod_actions.create_column("start_time", db.types.bigint)
-            timed_mod_actions.create_column("end_time", db.types.bigint)
-            timed_mod_actions.create_column("is_done", db.types.boolean, default=False)
-            timed_mod_actions.create_column("reason", db.types.text)
-            log.info("Created missing table: timed_mod_actions")
-
-        if "tickets" not in db:
-            tickets = db.create_table("tickets")
-            tickets.create_column("user_id", db.types.bigint)
-            tickets.create_column("guild", db.types.bigint)
-            tickets.create_column("timestamp", db.types.bigint)
-            tickets.create_column("ticket_subject", db.types.text)
-            tickets.create_column("ticket_message", db.types.text)
-            tickets.create_column("log_url", db.types.text)
-            tickets.create_column("status", db.types.boolean)
-            log.info("Created missing table: tickets")
-
-        if "starboard" not in db:
-            starboard = db.create_table("starboard")
-            starboard.create_column("channel_id", db.types.bigint)
-            starboard.create_column("message_id", db.types.bigint)
-            starboard.create_column("star_embed_id", db.types.bigint)
-
-        db.commit()
-        db.close()
+def session():
+    """
+    Shorthand for `async with database.session() as db:` on the process-wide Database.
+    """
+    return get_database().session()
@@ -0,0 +1,290 @@
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict, deque
+from typing import Iterable
+from urllib.parse import urlsplit
+
+
+log = logging.getLogger(__name__)
+
+# Actions in increasing order of severity, only the most severe matching action is taken.
+ACTIONS = ["delete", "timeout", "ban"]
+
+# The rules automod used before they were configurable, used when config doesn't define any.
+DEFAULT_RULES = [
+    {
+        "name": "cyrillic",
+        "regex": "[\u0400-\u04FF]",
+        "action": "delete",
+        "reason": "Message contained Cyrillic characters",
+    },
+    {
+        "name": "nitro_scam",
+        "keywords": ["nitro", "@everyone"],
+        "match": "all",
+        "action": "ban",
+        "reason": "Banned by potential Nitro scam link detection",
+    },
+]
+
+
+class KeywordMatcher:
+    """
+    An Aho-Corasick automaton that finds every occurrence of a set of keywords in one pass over the text.
+    """
+
+    def __init__(self, keywords: Iterable[str]) -> None:
+        # Each state is a dict of character transitions, indexed by state number; state 0 is the root.
+        self.transitions = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in self.transitions[state]:
+                    self.transitions.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.transitions[state][char] = len(self.transitions) - 1
+                state = self.transitions[state][char]
+            self.output[state].add(keyword)
+
+        # Breadth-first, so that a state's failure link is always resolved before its children's.
+        queue = deque(self.transitions[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.transitions[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.transitions[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.transitions[fallback].get(char, 0)
+                self.output[child] |= self.output[self.fail[child]]
+
+    def search(self, text: str) -> set[str]:
+        """
+        Returns the keywords that occur anywhere in `text`.
+        """
+        transitions, fail, output = self.transitions, self.fail, self.output
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in transitions[state]:
+                state = fail[state]
+            state = transitions[state].get(char, 0)
+            if output[state]:
+                found |= output[state]
+        return found
+
+
+class RuleEngine:
+    """
+    Compiles automod rules once into a keyword automaton and a single regex alternation.
+
+    A rule is a dict with a `name`, an `action` (one of ACTIONS) and a `reason`, plus any of:
+        `keywords`: case-insensitive substrings, of which `match` ("any" or "all") must occur.
+        `regex`: a pattern that must match. Use scoped flags such as `(?i:...)`, since every
+                 pattern is joined into one expression.
+        `duration`: the number of seconds a `timeout` action lasts.
+
+    A rule matches when all of the conditions it declares are met.
+
+    The alternation only tells whether any pattern matches at all: it reports a single rule per match
+    position, so an overlapping match of a more severe rule would be hidden behind a less severe one.
+    Each rule is then confirmed with its own pattern, most severe first.
+    """
+
+    def __init__(self, rules: list[dict]) -> None:
+        self.rules = []
+        for rule in rules:
+            if rule.get("action") not in ACTIONS or not (rule.get("keywords") or rule.get("regex")):
+                log.warning(f"Skipping invalid automod rule: {rule.get('name')}")
+                continue
+            self.rules.append(
+                dict(
+                    rule,
+                    keywords={keyword.lower() for keyword in rule.get("keywords") or []},
+                    pattern=re.compile(rule["regex"]) if rule.get("regex") else None,
+                    severity=ACTIONS.index(rule["action"]),
+                )
+            )
+        # Stable, so rules of equal severity keep their configured order.
+        self.rules.sort(key=lambda rule: rule["severity"], reverse=True)
+
+        self.keywords = KeywordMatcher({keyword for rule in self.rules for keyword in rule["keywords"]})
+
+        patterns = [f"(?:{rule['regex']})" for rule in self.rules if rule["pattern"]]
+        self.pattern = re.compile("|".join(patterns)) if patterns else None
+
+    def scan(self, content: str, lower_content: str = None) -> dict | None:
+        """
+        Returns the most severe rule that `content` matches, or None if it matches none.
+        """
+        keywords = self.keywords.search(lower_content or content.lower())
+        any_pattern = bool(self.pattern and self.pattern.search(content))
+        if not keywords and not any_pattern:
+            return None
+
+        for rule in self.rules:
+            if rule["keywords"]:
+                found = rule["keywords"] & keywords
+                if not found or (rule.get("match") == "all" and found != rule["keywords"]):
+                    continue
+            if rule["pattern"] and not (any_pattern and rule["pattern"].search(content)):
+                continue
+            return rule
+        return None
+
+
+class SpamDetector:
+    """
+    Tracks each user's recent messages in a sliding window to catch floods and copy-paste spam.
+
+    Every user gets a ring buffer of their last few messages as (time, channel ID, content hash)
+    entries, so a check only ever looks at a bounded number of entries. Users that have been quiet
+    for longer than the window, or the least recently active ones past `max_users`, are evicted.
+    """
+
+    def __init__(
+        self, window: float = 10, max_messages: int = 8, max_duplicates: int = 4, max_users: int = 10000
+    ) -> None:
+        self.window = window
+        self.max_messages = max_messages
+        self.max_duplicates = max_duplicates
+        self.max_users = max_users
+        self.buffer_size = max(max_messages, max_duplicates)
+        self.users = OrderedDict()
+
+    def check(self, user_id: int, channel_id: int, content: str, now: float = None) -> str | None:
+        """
+        Records a message and returns the reason it is spam, or None if it isn't.
+        """
+        now = now or time.monotonic()
+        self.evict(now)
+
+        content = content.strip().lower()
+        digest = hash(content) if content else None
+        buffer = self.users.get(user_id)
+        if buffer is None:
+            buffer = self.users[user_id] = deque(maxlen=self.buffer_size)
+        self.users.move_to_end(user_id)
+        buffer.append((now, channel_id, digest))
+
+        since = now - self.window
+        recent = [entry for entry in buffer if entry[0] > since]
+        if sum(1 for entry in recent if entry[1] == channel_id) >= self.max_messages:
+            reason = f"Sent {self.max_messages} messages in {self.window} seconds"
+        elif digest and sum(1 for entry in recent if entry[2] == digest) >= self.max_duplicates:
+            reason = f"Sent the same message {self.max_duplicates} times in {self.window} seconds"
+        else:
+            return None
+
+        # Start over so that the same burst doesn't trigger again.
+        del self.users[user_id]
+        return reason
+
+    def evict(self, now: float) -> None:
+        """
+        Drops users who have been idle for longer than the window, oldest activity first.
+        """
+        while self.users:
+            user_id, buffer = next(iter(self.users.items()))
+            if len(self.users) <= self.max_users and buffer[-1][0] > now - self.window:
+                break
+            del self.users[user_id]
+
+
+# Non-ASCII characters that render like ASCII letters, commonly used to disguise scam domains.
+HOMOGLYPHS = str.maketrans(
+    "аɑαЬьсϲԁɗеёєεɡցһіїıɩιјϳκкӏǀмпηоοօσрρԛгѕтτυսνѵԝѡхχуγᴢ",
+    "aaabbccddeeeegghiiiiijjkkllmnnooooppqrsttuuvvwwxxyyz",
+)
+
+# The characters a hostname can be made of, including the fullwidth and ideographic dots that browsers read as dots.
+HOSTNAME_PATTERN = re.compile(r"[\w.\-\uff0e\u3002\uff61]+")
+
+
+def normalize_host(host: str) -> str:
+    """
+    Folds a hostname to the form scam domains are indexed by: lowercase, punycode
+    decoded, compatibility characters (e.g. fullwidth letters) and homoglyphs replaced
+    by the ASCII letters they imitate, and without a trailing dot.
+    """
+    labels = []
+    for label in host.lower().strip(".").split("."):
+        if label.startswith("xn--"):
+            try:
+                label = label.encode().decode("idna")
+            except UnicodeError:
+                pass
+        labels.append(label)
+    return unicodedata.normalize("NFKC", ".".join(labels)).lower().translate(HOMOGLYPHS)
+
+
+def extract_hosts(urls: list[str]) -> set[str]:
+    """
+    Returns the normalized hostnames of the URLs found in a message.
+
+    A URL is matched up to the next whitespace, so the hostname of a bare domain can be followed by
+    whatever the message continues with, e.g. the `)` of a masked link or a comma. Only the part of
+    the hostname up to the first character that can't be in one is kept.
+    """
+    hosts = set()
+    for url in urls:
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            continue
+        match = HOSTNAME_PATTERN.match(host or "")
+        if match:
+            hosts.add(normalize_host(match.group()))
+    return hosts
+
+
+class DomainIndex:
+    """
+    A set of known scam domains loaded from a file with one domain per line, where a
+    domain also matches all of its subdomains.
+
+    Checking a host looks up the host and each of its parent domains in the set, so the
+    cost depends on the length of the host and not on the size of the list.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.mtime = None
+        self.domains = frozenset()
+
+    def reload(self) -> bool:
+        """
+        Reloads the domains if the file changed since the last load, returns whether it did.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+
+        with open(self.path, encoding="utf-8") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+        domains = frozenset(normalize_host(line) for line in lines if line)
+
+        self.domains = domains
+        self.mtime = mtime
+        log.info(f"Loaded {len(domains)} scam domains from {self.path}")
+        return True
+
+    def match(self, host: str) -> str | None:
+        """
+        Returns the listed domain that a normalized host is or belongs to, if any.
+        """
+        while host:
+            if host in self.domains:
+                return host
+            _, _, host = host.partition(".")
+        return None
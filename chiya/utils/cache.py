@@ -0,0 +1,61 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class TTLCache:
+    """
+    A bounded mapping whose entries expire `ttl` seconds after they were set.
+
+    Entries are kept in the order they were last set, so once `maxsize` is reached
+    the least recently set entry is evicted. Expired entries are dropped lazily when
+    they are looked up or reach the front of the cache.
+    """
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.data = OrderedDict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self) is not self
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Returns the value for `key`, or `default` if it is missing or expired.
+        """
+        entry = self.data.get(key)
+        if not entry:
+            return default
+
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self.data[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value: Any = True, created_at: float = None) -> None:
+        """
+        Stores `value` for `key`, expiring `ttl` seconds after `created_at` (defaults to now).
+        """
+        self.data[key] = ((created_at or time.time()) + self.ttl, value)
+        self.data.move_to_end(key)
+        self.evict()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self.data.pop(key, None)
+        return entry[1] if entry else default
+
+    def evict(self) -> None:
+        """
+        Drops expired entries from the front of the cache and the oldest entries beyond `maxsize`.
+        """
+        now = time.time()
+        while self.data:
+            expires_at, _ = next(iter(self.data.values()))
+            if len(self.data) <= self.maxsize and expires_at > now:
+                break
+            self.data.popitem(last=False)
@@ -6,9 +6,20 @@ from typing import Tuple
 import discord
 from discord.commands import context
 
+from chiya import config
+from chiya.utils.cache import TTLCache
+
 
 log = logging.getLogger(__name__)
 
+# Roles allowed to use staff-only tools, both key names for the trial role are in use across configs.
+STAFF_ROLE_IDS = frozenset(
+    filter(None, (config["roles"].get("staff"), config["roles"].get("trial"), config["roles"].get("trial_mod")))
+)
+
+# Role IDs of recently seen members by (guild ID, member ID), dropped whenever their roles change.
+member_role_ids = TTLCache(maxsize=10000, ttl=60 * 60)
+
 
 async def can_action_member(ctx: context.ApplicationContext, member: discord.Member) -> bool:
     # Stop mods from actioning on the bot.
@@ -30,6 +41,31 @@ async def can_action_member(ctx: context.ApplicationContext, member: discord.Mem
     return True
 
 
+def get_role_ids(member: discord.Member) -> frozenset[int]:
+    """
+    Returns the IDs of the member's roles, cached until their roles change.
+    """
+    key = (member.guild.id, member.id)
+    role_ids = member_role_ids.get(key)
+    if role_ids is None:
+        role_ids = frozenset(role.id for role in member.roles)
+        member_role_ids.set(key, role_ids)
+    return role_ids
+
+
+def invalidate_role_ids(member: discord.Member) -> None:
+    member_role_ids.pop((member.guild.id, member.id))
+
+
+def is_staff(member: discord.Member | discord.User) -> bool:
+    """
+    Checks whether a member has a staff or trial role. Users who are not in the server never are.
+    """
+    if not isinstance(member, discord.Member):
+        return False
+    return not STAFF_ROLE_IDS.isdisjoint(get_role_ids(member))
+
+
 def get_duration(duration) -> Tuple[str, int]:
     regex = (
         r"("
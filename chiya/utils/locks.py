@@ -0,0 +1,25 @@
+import asyncio
+import weakref
+from typing import Hashable
+
+
+class KeyedLock:
+    """
+    One asyncio lock per key, e.g. `async with self.locks(message_id):`.
+
+    The locks are only weakly referenced, so a key's lock is dropped as soon
+    as no coroutine holds or waits for it, and the map never outgrows the
+    number of keys currently in use.
+    """
+
+    def __init__(self) -> None:
+        self.locks = weakref.WeakValueDictionary()
+
+    def __call__(self, key: Hashable) -> asyncio.Lock:
+        lock = self.locks.get(key)
+        if not lock:
+            lock = self.locks[key] = asyncio.Lock()
+        return lock
+
+    def __len__(self) -> int:
+        return len(self.locks)
@@ -0,0 +1,86 @@
+import logging
+import re
+from functools import cached_property
+from typing import Awaitable, Callable
+
+import discord
+
+from chiya.utils import helpers
+
+
+log = logging.getLogger(__name__)
+
+# URLs end at whitespace or a bracket, so that a masked link's `)` or a bracketed link's `]` isn't part of the URL.
+URL_PATTERN = re.compile(r"https?://[^\s<>|()\[\]]+", re.IGNORECASE)
+
+# Registered stages by name, each as (priority, callback). Lower priorities run first.
+stages = {}
+
+
+class MessageContext:
+    """
+    A message shared by every stage of the pipeline, with the derived values
+    that more than one stage needs computed at most once.
+    """
+
+    def __init__(self, message: discord.Message) -> None:
+        self.message = message
+        self.deleted = False
+
+    @cached_property
+    def content(self) -> str:
+        return self.message.content
+
+    @cached_property
+    def lower_content(self) -> str:
+        return self.content.lower()
+
+    @cached_property
+    def clean_content(self) -> str:
+        return self.message.clean_content
+
+    @cached_property
+    def lower_clean_content(self) -> str:
+        return self.clean_content.lower()
+
+    @cached_property
+    def is_staff(self) -> bool:
+        return helpers.is_staff(self.message.author)
+
+    @cached_property
+    def urls(self) -> list[str]:
+        return URL_PATTERN.findall(self.content) if "http" in self.lower_content else []
+
+    async def delete(self) -> None:
+        """
+        Deletes the message and stops the stages after the current one from running.
+        """
+        await self.message.delete()
+        self.deleted = True
+
+
+def register_stage(name: str, callback: Callable[[MessageContext], Awaitable[None]], priority: int) -> None:
+    """
+    Adds a stage to the pipeline, replacing any stage previously registered under the same name.
+    """
+    stages[name] = (priority, callback)
+
+
+def unregister_stage(name: str) -> None:
+    stages.pop(name, None)
+
+
+async def dispatch(message: discord.Message) -> MessageContext:
+    """
+    Runs every registered stage on the message in priority order until one of them deletes it.
+    """
+    ctx = MessageContext(message)
+    for name, (_, callback) in sorted(stages.items(), key=lambda stage: stage[1][0]):
+        try:
+            await callback(ctx)
+        except Exception:
+            log.exception(f"Message pipeline stage {name} failed")
+
+        if ctx.deleted:
+            break
+    return ctx
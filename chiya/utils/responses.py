@@ -0,0 +1,100 @@
+import logging
+import os
+import re
+
+import discord
+from pyaml_env import parse_config
+
+from chiya.utils import embeds
+
+
+log = logging.getLogger(__name__)
+
+RULES_COLOR = 0x7D98E9
+# Matches nothing, used for the prefix and regex triggers until there are any.
+NEVER = re.compile("(?!)")
+
+
+def normalize_trigger(text: str) -> str:
+    """
+    Lowercases text and collapses its whitespace so that triggers match regardless of either.
+    """
+    return " ".join(text.lower().split())
+
+
+class ResponseIndex:
+    """
+    The autoresponder's canned responses, loaded from a YAML file with their embeds prebuilt.
+
+    Exact triggers are looked up in a dict keyed by the normalized trigger. Prefix and regex
+    triggers are each compiled into a single alternation with one named group per response,
+    so finding a response costs the same however many of them there are.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.mtime = None
+        self.exact = {}
+        self.prefix = NEVER
+        self.regex = NEVER
+        self.grouped = {}
+        self.rules = []
+
+    def reload(self) -> bool:
+        """
+        Rebuilds the index if the file changed since the last load, returns whether it did.
+        """
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return False
+
+        data = parse_config(self.path)
+        rules, rules_url, responses = data.get("rules") or [], data.get("rules_url"), data.get("responses") or []
+
+        exact, grouped, prefixes, patterns = {}, {}, [], []
+        for number, rule in enumerate(rules, start=1):
+            exact[f"rule{number}"] = embeds.make_embed(
+                title=f"Rule {number}: {rule['title']}",
+                description=rule["description"],
+                color=RULES_COLOR,
+                thumbnail_url=rule.get("thumbnail_url"),
+                title_url=rules_url,
+            )
+
+        for index, response in enumerate(responses):
+            embed = embeds.make_embed(**response["embed"])
+            match response.get("match", "exact"):
+                case "exact":
+                    exact[normalize_trigger(response["trigger"])] = embed
+                case "prefix":
+                    prefixes.append((normalize_trigger(response["trigger"]), f"response{index}"))
+                    grouped[f"response{index}"] = embed
+                case "regex":
+                    patterns.append(f"(?P<response{index}>{response['trigger']})")
+                    grouped[f"response{index}"] = embed
+                case _:
+                    log.warning(f"Skipping autoresponse with unknown match type: {response['trigger']}")
+
+        # Longest prefixes first, so that "!faq vpn" wins over "!faq".
+        prefixes.sort(key=lambda prefix: len(prefix[0]), reverse=True)
+        self.prefix = re.compile("|".join(f"(?P<{name}>{re.escape(trigger)})" for trigger, name in prefixes) or NEVER)
+        self.regex = re.compile("|".join(patterns) or NEVER)
+        self.exact = exact
+        self.grouped = grouped
+        self.rules = rules
+        self.mtime = mtime
+        log.info(f"Loaded {len(exact) + len(grouped)} autoresponses from {self.path}")
+        return True
+
+    def find(self, content: str) -> discord.Embed | None:
+        """
+        Returns the embed of the response that a normalized message triggers, if any.
+        """
+        if content in self.exact:
+            return self.exact[content]
+
+        match = self.prefix.match(content) or self.regex.search(content)
+        return self.grouped[match.lastgroup] if match else None
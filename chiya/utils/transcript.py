@@ -0,0 +1,146 @@
+import asyncio
+import gzip
+import io
+import logging
+import re
+import time
+
+import discord
+import privatebinapi
+from sqlalchemy import column, func, select, table
+
+from chiya import config, database
+
+
+log = logging.getLogger(__name__)
+
+# Seconds to wait for a single PrivateBin upload, and how many times to try before giving up.
+UPLOAD_TIMEOUT = 30
+UPLOAD_ATTEMPTS = 3
+
+# The words (and IDs) that transcripts are indexed and searched by.
+TERM_PATTERN = re.compile(r"\w{2,64}")
+
+
+def write_message(transcript: io.StringIO, message: discord.Message) -> None:
+    """
+    Appends a message to a transcript, followed by the URL of each of its attachments
+    and the text of each of its embeds.
+    """
+    formatted_time = message.created_at.strftime("%Y-%m-%d %H:%M:%S")
+    transcript.write(f"[{formatted_time}] {message.author}: {message.content}\n")
+
+    for attachment in message.attachments:
+        transcript.write(f"    Attachment: {attachment.url}\n")
+
+    for embed in message.embeds:
+        parts = [part for part in (embed.title, embed.description, embed.url) if part]
+        parts.extend(f"{field.name}: {field.value}" for field in embed.fields)
+        transcript.write(f"    Embed: {' | '.join(parts)}\n")
+
+
+async def upload(text: str) -> str:
+    """
+    Uploads a transcript to PrivateBin and returns its URL.
+
+    privatebinapi asks the server for its version and encrypts the transcript on an executor thread,
+    so that neither blocks the event loop, then posts it with an async HTTP client. Only the post is
+    cancelled when the upload takes longer than UPLOAD_TIMEOUT. The version request has no timeout of
+    its own and keeps its thread until it returns, the upload just stops waiting for it. Failed uploads
+    are retried with an increasing delay, but timed out ones aren't: the server may have created the
+    paste regardless.
+    """
+    for attempt in range(1, UPLOAD_ATTEMPTS + 1):
+        try:
+            send = privatebinapi.send_async(config["privatebin"]["url"], text=text, expiration="never")
+            paste = await asyncio.wait_for(send, timeout=UPLOAD_TIMEOUT)
+            return paste["full_url"]
+        except Exception as e:
+            if attempt == UPLOAD_ATTEMPTS or isinstance(e, asyncio.TimeoutError):
+                raise
+            log.warning(f"Unable to upload transcript to PrivateBin (attempt {attempt}/{UPLOAD_ATTEMPTS}): {e!r}")
+            await asyncio.sleep(2**attempt)
+
+
+def extract_terms(text: str) -> set[str]:
+    return set(TERM_PATTERN.findall(text.lower()))
+
+
+def compress(text: str) -> bytes:
+    return gzip.compress(text.encode())
+
+
+def decompress(data: bytes) -> str:
+    return gzip.decompress(data).decode()
+
+
+async def archive(ticket: dict, channel_name: str, text: str) -> None:
+    """
+    Stores the compressed transcript of a closed ticket and indexes the words in it.
+
+    Compressing and tokenizing a long transcript takes a while, so both run on an executor thread.
+    Only storing the transcript can fail the archive, a ticket that couldn't be indexed can still
+    be read with /tickets transcript.
+    """
+    loop = asyncio.get_running_loop()
+    data, terms = await loop.run_in_executor(None, lambda: (compress(text), extract_terms(text)))
+
+    async with database.session() as db:
+        await db["ticket_transcripts"].upsert(
+            dict(
+                ticket_id=ticket["id"],
+                user_id=ticket["user_id"],
+                channel_name=channel_name,
+                closed_at=int(time.time()),
+                transcript=data,
+            ),
+            ["ticket_id"],
+        )
+
+    try:
+        async with database.session() as db:
+            await db["ticket_terms"].delete(ticket_id=ticket["id"])
+            await db["ticket_terms"].insert_many([dict(term=term, ticket_id=ticket["id"]) for term in terms])
+    except Exception as e:
+        log.error(f"Unable to index the transcript of ticket {ticket['id']}: {e!r}")
+
+
+async def search(user_id: int = None, keywords: str = None, limit: int = 100) -> list[dict]:
+    """
+    Returns the closed tickets of a user (or of everyone) whose transcripts contain every word
+    in `keywords`, newest first.
+    """
+    filters = dict(status=True)
+    if user_id:
+        filters["user_id"] = user_id
+
+    async with database.session() as db:
+        if keywords:
+            terms = sorted(extract_terms(keywords))
+            if not terms:
+                return []
+
+            ticket_terms = table("ticket_terms", column("term"), column("ticket_id"))
+            statement = (
+                select(ticket_terms.c.ticket_id)
+                .where(ticket_terms.c.term.in_(terms))
+                .group_by(ticket_terms.c.ticket_id)
+                .having(func.count() == len(terms))
+            )
+            filters["id"] = [row["ticket_id"] for row in await db.query(statement)]
+            if not filters["id"]:
+                return []
+
+        return await db["tickets"].find(**filters, order_by="-id", _limit=limit)
+
+
+async def load(ticket_id: int) -> str | None:
+    """
+    Returns the archived transcript of a ticket, if it has one.
+    """
+    async with database.session() as db:
+        row = await db["ticket_transcripts"].find_one(ticket_id=ticket_id)
+
+    if not row:
+        return None
+    return await asyncio.get_running_loop().run_in_executor(None, decompress, row["transcript"])